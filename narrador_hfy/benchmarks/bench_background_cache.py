@@ -0,0 +1,68 @@
+"""
+Comparación de memoria y tiempo al preparar el fondo de cada segmento.
+
+"anterior": ImageClip(ruta).resize(resolución) por segmento, como hacía
+VideoCreator (cada clip decodifica y redimensiona su propia copia).
+"compartido": VideoCreator._load_background, que decodifica una vez y
+reutiliza el mismo array en todos los clips.
+
+Uso:
+    python benchmarks/bench_background_cache.py [n_segmentos]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from moviepy.editor import ImageClip
+from PIL import Image
+
+from narrator_app.modules.video_creator import VideoCreator
+
+RESOLUTION = (1920, 1080)
+
+# moviepy 1.0.3 redimensiona con Image.ANTIALIAS, eliminado en Pillow 10.
+if not hasattr(Image, 'ANTIALIAS'):
+    Image.ANTIALIAS = Image.LANCZOS
+
+
+def legacy_clips(bg_path, n_segments):
+    return [ImageClip(bg_path, duration=3).resize(RESOLUTION) for _ in range(n_segments)]
+
+
+def shared_clips(bg_path, n_segments):
+    creator = VideoCreator({'video': {'resolution': list(RESOLUTION)}})
+    return [ImageClip(creator._load_background(bg_path), duration=3) for _ in range(n_segments)]
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    clips = fn(*args)
+    for clip in clips:
+        clip.get_frame(0)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del clips
+    return elapsed, peak / 1024 ** 2
+
+
+def main():
+    n_segments = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as tmp:
+        bg_path = os.path.join(tmp, 'bg.png')
+        Image.effect_noise((2560, 1440), 64).convert('RGB').save(bg_path)
+
+        print(f"{n_segments} segmentos, fondo 2560x1440 -> {RESOLUTION[0]}x{RESOLUTION[1]}")
+        print(f"{'método':<12}{'tiempo (s)':>12}{'pico de memoria (MB)':>24}")
+        for name, fn in (("anterior", legacy_clips), ("compartido", shared_clips)):
+            elapsed, peak_mb = measure(fn, bg_path, n_segments)
+            print(f"{name:<12}{elapsed:>12.2f}{peak_mb:>24.1f}")
+
+
+if __name__ == "__main__":
+    main()
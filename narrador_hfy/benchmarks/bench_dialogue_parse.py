@@ -0,0 +1,186 @@
+"""
+Benchmark del análisis de diálogos.
+
+Compara la implementación anterior (un único Doc con toda la historia y un
+análisis de spaCy adicional por cada cita para buscar al hablante) con la
+actual, que analiza los párrafos por lotes con nlp.pipe y reutiliza sus
+tokens. Cuenta las llamadas al pipeline y mide el tiempo sobre un capítulo
+sintético con mucho diálogo.
+
+Uso:
+    python benchmarks/bench_dialogue_parse.py [modelo_spacy] [n_process]
+
+Si el modelo no está instalado se usa spacy.blank('es'), que solo tokeniza:
+el número de llamadas es el mismo, pero el coste de cada una es muy inferior
+al de un modelo real, así que la diferencia de tiempo queda subestimada.
+"""
+import os
+import random
+import re
+import sys
+import time
+
+import spacy
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from narrator_app.data_structures import Character, Dialogue
+from narrator_app.modules.dialogue_analyzer import DialogueAnalyzer
+
+N_PARAGRAPHS = 400
+QUOTES_PER_PARAGRAPH = 3
+
+
+class CountingNLP:
+    """Envuelve el pipeline de spaCy y cuenta cuántas veces se invoca."""
+
+    def __init__(self, nlp):
+        self.nlp = nlp
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return self.nlp(text)
+
+    def pipe(self, texts, **kwargs):
+        self.calls += 1
+        return self.nlp.pipe(texts, **kwargs)
+
+
+class LegacyDialogueAnalyzer(DialogueAnalyzer):
+    """
+    Implementación original, copiada tal cual de la versión base: un análisis
+    de spaCy adicional por cada cita para buscar al hablante.
+    """
+
+    def _create_script(self, doc, characters):
+        script = []
+        char_map = {c.name: c.id for c in characters}
+        last_speaker_id = "narrator"
+
+        paragraphs = doc.text.split('\n\n')
+
+        for paragraph in paragraphs:
+            if not paragraph.strip():
+                continue
+
+            matches = list(self.dialogue_pattern.finditer(paragraph))
+
+            if not matches:
+                script.append(Dialogue(text=paragraph, character_id="narrator"))
+                last_speaker_id = "narrator"
+            else:
+                last_match_end = 0
+                for match in matches:
+                    start, end = match.span()
+
+                    narrator_text = paragraph[last_match_end:start].strip()
+                    if narrator_text:
+                        script.append(Dialogue(text=narrator_text, character_id="narrator"))
+
+                    dialogue_text = match.group(1).strip()
+
+                    context_text = paragraph[end:].strip()
+                    speaker_id = self._find_speaker_in_context(context_text, char_map)
+
+                    if speaker_id:
+                        last_speaker_id = speaker_id
+
+                    script.append(Dialogue(text=dialogue_text, character_id=last_speaker_id))
+                    last_match_end = end
+
+                final_narrator_text = paragraph[last_match_end:].strip()
+                if final_narrator_text:
+                    script.append(Dialogue(text=final_narrator_text, character_id="narrator"))
+
+        return script
+
+    def _find_speaker_in_context(self, context, char_map):
+        context_doc = self.nlp(context)
+        for token in context_doc:
+            if token.lemma_ in self.speech_verbs:
+                for child in token.children:
+                    if child.dep_ == "nsubj":
+                        if child.text in char_map:
+                            return char_map[child.text]
+
+        for name, char_id in char_map.items():
+            if name in context:
+                return char_id
+
+        return None
+
+
+def build_chapter(rng):
+    names = ["Marta", "Tomás", "Kira", "Varn", "Elena", "Oskar"]
+    verbs = ["dijo", "preguntó", "respondió", "gritó", "susurró", "exclamó"]
+    filler = ["la", "nave", "tembló", "mientras", "los", "humanos", "miraban", "las", "estrellas",
+              "y", "el", "capitán", "no", "sabía", "qué", "hacer", "con", "aquella", "flota"]
+    paragraphs = []
+    for _ in range(N_PARAGRAPHS):
+        parts = []
+        for _ in range(QUOTES_PER_PARAGRAPH):
+            quote = " ".join(rng.choice(filler) for _ in range(rng.randint(6, 14)))
+            parts.append(f"«{quote.capitalize()}» {rng.choice(verbs)} {rng.choice(names)}.")
+            parts.append(" ".join(rng.choice(filler) for _ in range(rng.randint(8, 20))).capitalize() + ".")
+        paragraphs.append(" ".join(parts))
+    return "\n\n".join(paragraphs), names
+
+
+def make_analyzer(cls, nlp, n_process=1):
+    analyzer = cls.__new__(cls)
+    analyzer.config = {}
+    analyzer.model_name = "benchmark"
+    analyzer.nlp = CountingNLP(nlp)
+    analyzer.batch_size = 64
+    analyzer.n_process = n_process
+    analyzer.dialogue_pattern = re.compile(r'["«“]([^"»”]+)["»”]')
+    analyzer.speech_verbs = {'dijo', 'preguntó', 'respondió', 'gritó', 'susurró', 'exclamó'}
+    return analyzer
+
+
+def run(analyzer, text, characters):
+    start = time.perf_counter()
+    if isinstance(analyzer, LegacyDialogueAnalyzer):
+        parsed = analyzer.nlp(text)
+    else:
+        parsed = analyzer._parse_paragraphs(text.split('\n\n'))
+    script = analyzer._create_script(parsed, characters)
+    return script, time.perf_counter() - start
+
+
+def main():
+    model_name = sys.argv[1] if len(sys.argv) > 1 else "es_core_news_md"
+    n_process = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    try:
+        nlp = spacy.load(model_name)
+    except OSError:
+        print(f"Modelo '{model_name}' no instalado; usando spacy.blank('es') (solo tokenizador).")
+        model_name = "blank:es"
+        nlp = spacy.blank('es')
+
+    text, names = build_chapter(random.Random(42))
+    characters = make_analyzer(DialogueAnalyzer, nlp)._identify_characters([nlp(text)]) or []
+    if not characters:
+        # Sin NER (modelo en blanco) se usan los nombres conocidos del capítulo.
+        characters = [Character(id=n.lower(), name=n, voice_archetype="default") for n in names]
+
+    legacy = make_analyzer(LegacyDialogueAnalyzer, nlp)
+    current = make_analyzer(DialogueAnalyzer, nlp, n_process)
+    legacy_script, legacy_time = run(legacy, text, characters)
+    current_script, current_time = run(current, text, characters)
+
+    legacy_speakers = [entry.character_id for entry in legacy_script]
+    current_speakers = [entry.character_id for entry in current_script]
+    agreement = sum(a == b for a, b in zip(legacy_speakers, current_speakers)) / max(1, len(legacy_speakers))
+
+    print(f"Modelo: {model_name}. Capítulo sintético: {N_PARAGRAPHS} párrafos, "
+          f"{N_PARAGRAPHS * QUOTES_PER_PARAGRAPH} citas, {len(text.split())} palabras.")
+    print(f"{'implementación':<16}{'llamadas nlp':>14}{'tiempo (s)':>12}{'entradas':>10}")
+    print(f"{'anterior':<16}{legacy.nlp.calls:>14}{legacy_time:>12.3f}{len(legacy_script):>10}")
+    print(f"{'nlp.pipe':<16}{current.nlp.calls:>14}{current_time:>12.3f}{len(current_script):>10}")
+    print(f"Coincidencia de hablantes: {agreement:.1%}. Aceleración: x{legacy_time / current_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark de la protección de términos del traductor.
+
+Compara la implementación anterior (dos regex por término y por párrafo) con
+TermMatcher (una única alternación compilada por lote) sobre una historia
+sintética de 50k palabras con 500 términos protegidos.
+
+Uso:
+    python benchmarks/bench_protect_terms.py
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from narrator_app.modules.term_matcher import TermMatcher
+
+N_WORDS = 50_000
+N_TERMS = 500
+WORDS_PER_PARAGRAPH = 80
+
+
+def legacy_protect_terms(texts, all_terms):
+    """Implementación original de StoryTranslator._protect_terms."""
+    protected_texts = []
+    terms_map = []
+    for text in texts:
+        current_map = {}
+        temp_text = text
+        for i, term in enumerate(all_terms):
+            placeholder = f"__TERM{i}__"
+            if re.search(r'\b' + re.escape(term) + r'\b', temp_text, re.IGNORECASE):
+                temp_text = re.sub(r'\b' + re.escape(term) + r'\b', placeholder, temp_text, flags=re.IGNORECASE)
+                current_map[placeholder] = term
+        protected_texts.append(temp_text)
+        terms_map.append(current_map)
+    return protected_texts, terms_map
+
+
+def legacy_restore_terms(texts, terms_map):
+    restored_texts = []
+    for text, current_map in zip(texts, terms_map):
+        for placeholder, term in current_map.items():
+            text = text.replace(placeholder, term)
+        restored_texts.append(text)
+    return restored_texts
+
+
+def matcher_protect_terms(texts, all_terms):
+    matcher = TermMatcher(all_terms)
+    protected_texts = []
+    terms_map = []
+    for text in texts:
+        protected_text, current_map = matcher.protect(text)
+        protected_texts.append(protected_text)
+        terms_map.append(current_map)
+    return protected_texts, terms_map
+
+
+def matcher_restore_terms(texts, terms_map):
+    return [TermMatcher.restore(text, current_map) for text, current_map in zip(texts, terms_map)]
+
+
+def build_story(rng):
+    vocabulary = ["the", "ship", "captain", "said", "and", "humans", "were", "never", "meant",
+                  "to", "fight", "stars", "deathworld", "engine", "fleet", "of", "a", "in"]
+    terms = [f"Zor{''.join(rng.choice('aeiouklmnrstv') for _ in range(5))}{i}" for i in range(N_TERMS)]
+    words = [rng.choice(terms) if rng.random() < 0.05 else rng.choice(vocabulary) for _ in range(N_WORDS)]
+    paragraphs = [" ".join(words[i:i + WORDS_PER_PARAGRAPH]) + "."
+                  for i in range(0, N_WORDS, WORDS_PER_PARAGRAPH)]
+    return paragraphs, terms
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    paragraphs, terms = build_story(random.Random(42))
+    print(f"Historia sintética: {len(paragraphs)} párrafos, {N_WORDS} palabras, {len(terms)} términos.")
+
+    (legacy_texts, legacy_map), legacy_protect = timed(legacy_protect_terms, paragraphs, terms)
+    legacy_out, legacy_restore = timed(legacy_restore_terms, legacy_texts, legacy_map)
+
+    (new_texts, new_map), new_protect = timed(matcher_protect_terms, paragraphs, terms)
+    new_out, new_restore = timed(matcher_restore_terms, new_texts, new_map)
+
+    assert new_out == legacy_out, "Las dos implementaciones no producen el mismo texto restaurado."
+
+    legacy_total = legacy_protect + legacy_restore
+    new_total = new_protect + new_restore
+    print(f"{'implementación':<16}{'proteger (s)':>14}{'restaurar (s)':>15}{'total (s)':>12}")
+    print(f"{'anterior':<16}{legacy_protect:>14.3f}{legacy_restore:>15.3f}{legacy_total:>12.3f}")
+    print(f"{'TermMatcher':<16}{new_protect:>14.3f}{new_restore:>15.3f}{new_total:>12.3f}")
+    print(f"Aceleración: x{legacy_total / new_total:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Suite de benchmarks de extremo a extremo del pipeline.
+
+Ejecuta StoryProcessor._parse_story, StoryTranslator, DialogueAnalyzer,
+TTSIntegration y VideoCreator (motor ffmpeg) sobre historias sintéticas de
+distintos tamaños y densidades de diálogo, con los modelos sustituidos por
+los de benchmarks/stubs.py. Funciona sin red y solo con CPU; la etapa de
+video necesita el binario de ffmpeg y se omite si no está.
+
+Cada caso (tamaño, densidad) se ejecuta en un proceso propio para que el
+pico de memoria (RSS) de un caso no contamine al siguiente. El resultado es
+un JSON con claves ordenadas y una fila por (caso, etapa), pensado para
+guardarse junto al commit y compararse con --compare.
+
+Uso:
+    python benchmarks/run_suite.py
+    python benchmarks/run_suite.py --sizes 1000 20000 200000 --densities 0.1 0.6 --output bench.json
+    python benchmarks/run_suite.py --output nuevo.json --compare bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '..', 'src')))
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_SIZES = [1000, 5000, 20000, 50000, 200000]
+DEFAULT_DENSITIES = [0.1, 0.5]
+WORDS_PER_PARAGRAPH = 60
+CHARACTER_NAMES = ["Marta", "Tomás", "Kira", "Varn", "Elena", "Oskar", "Ilya", "Sol"]
+VOCABULARY = ["the", "ship", "captain", "humans", "were", "never", "meant", "to", "fight", "stars",
+              "deathworld", "engine", "fleet", "of", "a", "in", "and", "station", "crew", "alien",
+              "coffee", "drive", "hull", "orbit", "signal", "treaty", "war", "quiet", "light", "void"]
+
+
+def build_story_html(words: int, dialogue_density: float, seed: int = 42) -> str:
+    """HTML con la estructura que espera StoryProcessor._parse_story."""
+    rng = random.Random(seed)
+    paragraphs = []
+    written = 0
+    while written < words:
+        sentence_words = [rng.choice(VOCABULARY) for _ in range(WORDS_PER_PARAGRAPH)]
+        text = " ".join(sentence_words).capitalize() + "."
+        if rng.random() < dialogue_density:
+            quote = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(6, 16))).capitalize()
+            text = f"\"{quote}.\" dijo {rng.choice(CHARACTER_NAMES)}. {text}"
+        paragraphs.append(f"<p>{text}</p>")
+        written += len(text.split())
+    return (
+        "<html><body><h1>Synthetic Serial</h1>"
+        "<a href=\"/user/bench_author/\">bench_author</a>"
+        f"<div data-click-id=\"text\">{''.join(paragraphs)}</div>"
+        "</body></html>"
+    )
+
+
+def make_config(work_dir: str) -> Dict:
+    return {
+        'paths': {
+            'voice_bank': os.path.join(work_dir, 'voice_bank'),
+            'projects': os.path.join(work_dir, 'projects'),
+        },
+        'translation': {
+            'cache_path': os.path.join(work_dir, 'translations.sqlite3'),
+            'protected_terms': ["Deathworld", "HFY"],
+        },
+        'dialogue_analysis': {
+            'spacy_model': os.path.join(work_dir, 'spacy_stub'),
+        },
+        'tts': {
+            'workers': 1,
+            'audio_cache_enabled': False,
+            'narrator_voice': 'narrador',
+        },
+        'video': {
+            'engine': 'ffmpeg',
+            'resolution': [320, 180],
+            'fps': 5,
+            'fontsize': 14,
+            'title_duration_s': 1,
+            'default_background': os.path.join(work_dir, 'bg.png'),
+            'chunk_cache_path': os.path.join(work_dir, 'video_chunks'),
+        },
+    }
+
+
+def run_case(words: int, dialogue_density: float, video_max_words: int) -> List[Dict]:
+    """Ejecuta todas las etapas para un caso y devuelve una fila por etapa."""
+    from narrator_app.modules.dialogue_analyzer import DialogueAnalyzer
+    from narrator_app.modules.story_processor import StoryProcessor
+    from narrator_app.modules.translator import StoryTranslator
+    from narrator_app.modules.tts_integration import TTSIntegration
+    from narrator_app.modules.video_creator import VideoCreator
+    from narrator_app.profiling import tracer
+
+    import stubs
+
+    rows: List[Dict] = []
+    case = f"{words}w-d{dialogue_density}"
+
+    def measure(stage: str, unit: str):
+        span = tracer.span(stage, "bench", case=case)
+        span.unit = unit
+        return span
+
+    def collect(span_name: str):
+        event = [e for e in tracer.events() if e["cat"] == "bench" and e["name"] == span_name][-1]
+        rows.append({
+            "case": case,
+            "words": words,
+            "dialogue_density": dialogue_density,
+            "stage": span_name,
+            "wall_s": round(event["wall_s"], 3),
+            "cpu_s": round(event["cpu_s"], 3),
+            "peak_rss_mb": round(event["peak_rss_mb"], 1) if event["peak_rss_mb"] is not None else None,
+            "items": round(event["items"], 3) if event["items"] is not None else None,
+            "unit": event["unit"],
+            "throughput": event["throughput"],
+        })
+
+    with tempfile.TemporaryDirectory(prefix="narrador_bench_") as work_dir:
+        config = make_config(work_dir)
+        stubs.build_spacy_stub(config['dialogue_analysis']['spacy_model'], CHARACTER_NAMES)
+        stubs.write_reference_voice(os.path.join(config['paths']['voice_bank'], 'narrador.wav'))
+        html = build_story_html(words, dialogue_density)
+
+        with measure("parse", "párrafos") as span:
+            story = StoryProcessor(config)._parse_story(html, "https://www.reddit.com/r/HFY/comments/bench/")
+            span.items = story.original_text.count("\n\n") + 1
+        collect("parse")
+
+        translator = StoryTranslator(config)
+        stubs.install_translator_stub(translator)
+        with measure("translate", "párrafos") as span:
+            story = translator.translate_story(story)
+            span.items = story.translated_text.count("\n\n") + 1
+        collect("translate")
+
+        with measure("translate_cached", "párrafos") as span:
+            translator.translate_story(story.model_copy())
+            span.items = story.translated_text.count("\n\n") + 1
+        collect("translate_cached")
+
+        analyzer = DialogueAnalyzer(config)
+        with measure("analyze", "párrafos") as span:
+            story = analyzer.analyze_story(story)
+            span.items = story.translated_text.count("\n\n") + 1
+        collect("analyze")
+
+        for character in story.characters:
+            character.voice_archetype = 'narrador'
+        tts = TTSIntegration(config)
+        stubs.install_tts_stub(tts)
+        with measure("synthesize", "segmentos") as span:
+            story = tts.synthesize_script(story, os.path.join(work_dir, 'audio'))
+            span.items = len(story.script)
+        collect("synthesize")
+
+        if words <= video_max_words and shutil.which(config['video'].get('ffmpeg_binary', 'ffmpeg')):
+            with measure("render", "segmentos") as span:
+                VideoCreator(config).create_video_from_story(story, os.path.join(work_dir, 'out.mp4'))
+                span.items = len(story.script)
+            collect("render")
+
+    return rows
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def compare(base_path: str, results: List[Dict]):
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = {(row["case"], row["stage"]): row for row in json.load(f)["results"]}
+    print(f"\nComparación con {base_path} (tiempo de reloj):")
+    print(f"{'caso':<18}{'etapa':<18}{'antes (s)':>11}{'ahora (s)':>11}{'ratio':>8}")
+    for row in results:
+        previous = base.get((row["case"], row["stage"]))
+        if previous is None:
+            continue
+        ratio = row["wall_s"] / previous["wall_s"] if previous["wall_s"] else float('nan')
+        print(f"{row['case']:<18}{row['stage']:<18}{previous['wall_s']:>11.3f}{row['wall_s']:>11.3f}{ratio:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline con modelos sustitutos.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Tamaños en palabras.")
+    parser.add_argument('--densities', type=float, nargs='+', default=DEFAULT_DENSITIES,
+                        help="Fracción de párrafos con diálogo.")
+    parser.add_argument('--video-max-words', type=int, default=20000,
+                        help="Tamaño máximo para el que se mide el render de video.")
+    parser.add_argument('--output', help="Archivo JSON de resultados (por defecto, solo se imprime).")
+    parser.add_argument('--compare', help="JSON de una ejecución anterior con el que comparar.")
+    parser.add_argument('--case', nargs=2, metavar=('WORDS', 'DENSITY'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        # Proceso hijo: un único caso, resultados por stdout.
+        logging.basicConfig(level=logging.WARNING)
+        rows = run_case(int(args.case[0]), float(args.case[1]), args.video_max_words)
+        print(json.dumps(rows))
+        return
+
+    results: List[Dict] = []
+    for words in args.sizes:
+        for density in args.densities:
+            start = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--case', str(words), str(density),
+                 '--video-max-words', str(args.video_max_words)],
+                capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                print(completed.stderr[-2000:], file=sys.stderr)
+                raise SystemExit(f"Falló el caso {words} palabras / densidad {density}.")
+            rows = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.extend(rows)
+            summary = ", ".join(f"{row['stage']} {row['wall_s']:.2f}s" for row in rows)
+            print(f"{words:>7} palabras, densidad {density}: {summary} ({time.perf_counter() - start:.1f}s)")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": args.sizes,
+            "densities": args.densities,
+        },
+        "results": sorted(results, key=lambda row: (row["words"], row["dialogue_density"], row["stage"])),
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1, sort_keys=True, ensure_ascii=False)
+            f.write("\n")
+        print(f"Resultados guardados en {args.output}")
+    if args.compare:
+        compare(args.compare, report["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Modelos ligeros que sustituyen a Marian, spaCy y XTTS en los benchmarks.
+
+Reproducen la interfaz que usa cada módulo, no su calidad: sirven para medir
+el código del pipeline que rodea a los modelos (lotes, cachés, planificación,
+ensamblado de audio y video) sin descargas ni GPU. Con `delay_per_token` /
+`realtime_factor` se puede simular además el coste de un modelo real.
+"""
+import contextlib
+import os
+import sys
+import time
+import types
+import wave
+
+import spacy
+
+
+class StubEncoding(dict):
+    """Resultado del tokenizador: un dict con input_ids que admite .to(device)."""
+
+    def to(self, device):
+        return self
+
+
+class StubTokenizer:
+    """Tokenizador por espacios compatible con MarianTokenizer en lo que usa StoryTranslator."""
+
+    def __call__(self, texts, **kwargs):
+        input_ids = [text.split() + ["</s>"] for text in texts]
+        max_length = kwargs.get("max_length")
+        if kwargs.get("truncation") and max_length:
+            input_ids = [ids[:max_length] for ids in input_ids]
+        return StubEncoding(input_ids=input_ids)
+
+    def batch_decode(self, sequences, skip_special_tokens=True):
+        return [" ".join(token for token in ids if token != "</s>") for ids in sequences]
+
+
+class StubTranslationModel:
+    """Devuelve la misma secuencia de entrada («traducción» identidad)."""
+
+    def __init__(self, delay_per_token: float = 0.0):
+        self.delay_per_token = delay_per_token
+
+    def generate(self, input_ids, **kwargs):
+        if self.delay_per_token:
+            time.sleep(self.delay_per_token * sum(len(ids) for ids in input_ids))
+        return input_ids
+
+
+def install_torch_stub():
+    """
+    Si torch no está instalado, registra un módulo `torch` mínimo con lo único
+    que usa StoryTranslator alrededor del modelo (no_grad).
+    """
+    try:
+        import torch  # noqa: F401
+    except ImportError:
+        torch = types.ModuleType("torch")
+        torch.no_grad = contextlib.nullcontext
+        sys.modules["torch"] = torch
+
+
+def install_translator_stub(translator, delay_per_token: float = 0.0):
+    """Asigna el modelo sustituto; ensure_model_loaded() ya no cargará Marian."""
+    install_torch_stub()
+    translator.device = "cpu"
+    translator.tokenizer = StubTokenizer()
+    translator.model = StubTranslationModel(delay_per_token)
+
+
+def build_spacy_stub(path: str, character_names):
+    """
+    Guarda en `path` un pipeline de spaCy en blanco con un EntityRuler que
+    etiqueta los nombres de los personajes como PER. Se llama 'ner' para que
+    DialogueAnalyzer lo trate como su componente de entidades.
+    """
+    nlp = spacy.blank("es")
+    ruler = nlp.add_pipe("entity_ruler", name="ner")
+    ruler.add_patterns([{"label": "PER", "pattern": name} for name in character_names])
+    nlp.to_disk(path)
+    return path
+
+
+class StubTTS:
+    """Sustituto de TTS.api.TTS: escribe silencio proporcional a la longitud del texto."""
+
+    def __init__(self, chars_per_second: float = 150.0, sample_rate: int = 8000, realtime_factor: float = 0.0):
+        self.chars_per_second = chars_per_second
+        self.sample_rate = sample_rate
+        self.realtime_factor = realtime_factor
+
+    def tts_to_file(self, text, speaker_wav, language, file_path):
+        seconds = max(0.2, len(text) / self.chars_per_second)
+        if self.realtime_factor:
+            time.sleep(seconds * self.realtime_factor)
+        with wave.open(file_path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(b"\x00\x00" * int(seconds * self.sample_rate))
+
+
+def install_tts_stub(tts, **kwargs):
+    """Asigna el motor sustituto; ensure_model_loaded() ya no cargará XTTS."""
+    tts.device = "cpu"
+    tts._tts_engine = StubTTS(**kwargs)
+
+
+def write_reference_voice(path: str, seconds: float = 1.0, sample_rate: int = 8000):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * sample_rate))
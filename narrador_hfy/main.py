@@ -1,18 +1,18 @@
 import streamlit as st
 import os
 import sys
+import uuid
 import yaml
 
 # Añadir el directorio src al path para poder importar nuestros módulos
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
 
-# Importar todos los módulos de la aplicación
+# Importar la aplicación. Los módulos del pipeline (y sus modelos) los carga
+# AppOrchestrator la primera vez que se usan.
+from narrator_app.app_logic import AppOrchestrator
 from narrator_app.config import Config
-from narrator_app.modules.story_processor import StoryProcessor
-from narrator_app.modules.translator import StoryTranslator
-from narrator_app.modules.dialogue_analyzer import DialogueAnalyzer
-from narrator_app.modules.tts_integration import TTSIntegration
-from narrator_app.modules.video_creator import VideoCreator
+from narrator_app.profiling import startup_profiler, tracer
+from narrator_app.project_store import ProjectStore, STAGES
 from narrator_app.utils import setup_logging
 
 # --- Configuración de la Página y Logging ---
@@ -30,33 +30,68 @@ config = load_app_config()
 
 # --- Inicialización de Módulos (en caché para rendimiento) ---
 @st.cache_resource
+def get_orchestrator():
+    # Carga diferida: cada módulo se construye en el primer paso que lo necesita
+    # (o antes, en segundo plano, si está en pipeline.warm_up).
+    return AppOrchestrator(config)
+
 def get_story_processor():
-    return StoryProcessor(config)
+    return get_orchestrator().story_processor
 
-@st.cache_resource
 def get_translator():
-    return StoryTranslator(config)
+    return get_orchestrator().translator
 
-@st.cache_resource
 def get_dialogue_analyzer():
-    return DialogueAnalyzer(config)
+    return get_orchestrator().dialogue_analyzer
 
-@st.cache_resource
 def get_tts_integration():
-    return TTSIntegration(config)
+    return get_orchestrator().tts_integration
 
-@st.cache_resource
 def get_video_creator():
-    return VideoCreator(config)
+    return get_orchestrator().video_creator
+
+@st.cache_resource
+def get_project_store():
+    return ProjectStore(config)
+
+def save_project(*stages, **extra):
+    """
+    Guarda la historia actual en su proyecto para poder retomarla tras un
+    reinicio, junto con la traza de rendimiento de la sesión hasta este paso.
+    """
+    get_project_store().save(st.session_state.project_id, st.session_state.story, *stages, **extra)
+    get_orchestrator().export_trace(st.session_state.project_id)
 
 # --- Lógica de la Interfaz de Usuario (Asistente por Pasos) ---
 
+# El tracer es de todo el proceso: cada sesión del navegador mide sus etapas por separado.
+if 'trace_session' not in st.session_state:
+    st.session_state.trace_session = uuid.uuid4().hex
+tracer.set_session(st.session_state.trace_session)
+
+with st.sidebar.expander("Tiempos de arranque"):
+    st.code(startup_profiler.format_report())
+
+with st.sidebar.expander("Rendimiento por etapa", expanded=True):
+    stage_summary = tracer.stage_summary()
+    if stage_summary:
+        st.dataframe(stage_summary, hide_index=True)
+        if st.session_state.get('project_id'):
+            # La traza se exporta al completar cada paso (save_project); aquí solo se sirve.
+            trace_path = os.path.join(get_project_store().project_dir(st.session_state.project_id), "trace_chrome.json")
+            if os.path.exists(trace_path):
+                with open(trace_path, 'rb') as f:
+                    st.download_button("Descargar traza (Chrome/Perfetto)", f, file_name="trace_chrome.json")
+    else:
+        st.caption("Aún no se ha ejecutado ninguna etapa.")
+
 st.title("🤖 Asistente de Creación de Videos de Narración HFY")
 st.markdown("Sigue los pasos para convertir una historia de Reddit en un video narrado.")
 
 if 'step' not in st.session_state:
     st.session_state.step = 1
     st.session_state.story = None
+    st.session_state.project_id = None
     st.session_state.final_video_path = None
 
 # --- PASO 1: INGRESAR URL ---
@@ -68,12 +103,32 @@ if st.session_state.step == 1:
         with st.spinner("Obteniendo y limpiando la historia..."):
             try:
                 processor = get_story_processor()
+                tracer.reset()
                 st.session_state.story = processor.get_story_from_url(url)
+                st.session_state.project_id = ProjectStore.project_id_for_url(url)
+                get_project_store().invalidate_from(st.session_state.project_id, "fetched")
+                save_project("fetched")
                 st.session_state.step = 2
                 st.rerun()
             except Exception as e:
                 st.error(f"Error al procesar la historia: {e}")
 
+    projects = get_project_store().list_projects()
+    if projects:
+        st.subheader("O retoma un proyecto guardado")
+        labels = {f"{m['title']} ({', '.join(m['stages'])})": m['project_id'] for m in projects}
+        selected = st.selectbox("Proyectos guardados:", options=list(labels))
+        if st.button("Reanudar Proyecto"):
+            project_id = labels[selected]
+            story, manifest = get_project_store().load(project_id)
+            tracer.reset()
+            st.session_state.story = story
+            st.session_state.project_id = project_id
+            st.session_state.final_video_path = manifest.get('output_path')
+            completed = [stage for stage in STAGES if stage in manifest['stages']]
+            st.session_state.step = STAGES.index(completed[-1]) + 2 if completed else 1
+            st.rerun()
+
 # --- PASO 2: TRADUCIR ---
 if st.session_state.step == 2:
     st.header("Paso 2: Traducir la Historia")
@@ -85,6 +140,7 @@ if st.session_state.step == 2:
             try:
                 translator = get_translator()
                 st.session_state.story = translator.translate_story(st.session_state.story)
+                save_project("translated")
                 st.session_state.step = 3
                 st.rerun()
             except Exception as e:
@@ -101,6 +157,7 @@ if st.session_state.step == 3:
             try:
                 analyzer = get_dialogue_analyzer()
                 st.session_state.story = analyzer.analyze_story(st.session_state.story)
+                save_project("analyzed")
                 st.session_state.step = 4
                 st.rerun()
             except Exception as e:
@@ -129,8 +186,14 @@ if st.session_state.step == 4:
             with st.spinner("Generando audio... Este es el paso más largo."):
                 try:
                     tts = get_tts_integration()
-                    temp_audio_dir = "data/temp_audio"
-                    st.session_state.story = tts.synthesize_script(st.session_state.story, temp_audio_dir)
+                    temp_audio_dir = get_project_store().audio_dir(st.session_state.project_id)
+                    progress_bar = st.progress(0.0)
+                    st.session_state.story = tts.synthesize_script(
+                        st.session_state.story,
+                        temp_audio_dir,
+                        progress_callback=lambda fraction, message: progress_bar.progress(fraction, text=message),
+                    )
+                    save_project("synthesized")
                     st.session_state.step = 5
                     st.rerun()
                 except Exception as e:
@@ -147,14 +210,26 @@ if st.session_state.step == 5:
             if dialogue.audio_path and os.path.exists(dialogue.audio_path):
                 st.audio(dialogue.audio_path)
 
+    # Perfiles de render de video.profiles: vista previa rápida, video final o solo audio.
+    profiles = list(config.get('video', {}).get('profiles', {}))
+    default_profile = config.get('video', {}).get('profile')
+    render_profile = None
+    if profiles:
+        render_profile = st.selectbox(
+            "Perfil de render:",
+            options=profiles,
+            index=profiles.index(default_profile) if default_profile in profiles else 0,
+        )
+
     if st.button("5. Crear Video"):
         with st.spinner("Creando el video..."):
             try:
                 video_creator = get_video_creator()
-                output_path = f"data/output/{st.session_state.story.title.replace(' ', '_')}.mp4"
+                output_path = video_creator.output_path(st.session_state.story, render_profile)
                 os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                video_creator.create_video_from_story(st.session_state.story, output_path)
+                video_creator.create_video_from_story(st.session_state.story, output_path, profile=render_profile)
                 st.session_state.final_video_path = output_path
+                save_project("rendered", output_path=output_path, render_profile=render_profile)
                 st.session_state.step = 6
                 st.rerun()
             except Exception as e:
@@ -164,18 +239,23 @@ if st.session_state.step == 5:
 if st.session_state.step == 6:
     st.header("¡Proceso Completado!")
     st.balloons()
-    st.success(f"Tu video ha sido creado con éxito.")
-    
     video_path = st.session_state.final_video_path
+    # Los perfiles sin video producen un archivo de audio (.m4a u .opus).
+    is_video = video_path.endswith('.mp4')
+    st.success(f"Tu {'video' if is_video else 'audio'} ha sido creado con éxito.")
+
     with open(video_path, "rb") as file:
         st.download_button(
-            label="Descargar Video",
+            label="Descargar Video" if is_video else "Descargar Audio",
             data=file,
             file_name=os.path.basename(video_path),
-            mime="video/mp4"
+            mime="video/mp4" if is_video else ("audio/mp4" if video_path.endswith('.m4a') else "audio/ogg")
         )
     
-    st.video(video_path)
+    if is_video:
+        st.video(video_path)
+    else:
+        st.audio(video_path)
 
     if st.button("Crear otro video"):
         for key in list(st.session_state.keys()):
@@ -1,54 +1,403 @@
+import importlib
 import logging
-from typing import Callable, Any
+import os
+import queue
+import threading
+import time
+from typing import Callable, Any, Dict, Iterator, List, Optional, Tuple
 
-# Importaciones de nuestros módulos
+# Importaciones de nuestros módulos. Los módulos del pipeline (y sus modelos)
+# se importan y construyen de forma diferida, la primera vez que se usan.
 from .config import Config
 from .data_structures import Story
-from .modules.story_processor import StoryProcessor
-from .modules.translator import StoryTranslator
-from .modules.dialogue_analyzer import DialogueAnalyzer
-from .modules.tts_integration import TTSIntegration
-from .modules.video_creator import VideoCreator
+from .modules.audio_assembler import AudioAssembler, assemble_story_audio, load_timings
+from .profiling import startup_profiler, tracer
+from .project_store import ProjectStore
 
 logger = logging.getLogger(__name__)
 
+# Marca de fin de flujo entre las etapas del modo streaming.
+_END = object()
+
+# Módulos del pipeline: nombre -> (módulo a importar, clase).
+PIPELINE_MODULES = {
+    "story_processor": (".modules.story_processor", "StoryProcessor"),
+    "translator": (".modules.translator", "StoryTranslator"),
+    "dialogue_analyzer": (".modules.dialogue_analyzer", "DialogueAnalyzer"),
+    "tts_integration": (".modules.tts_integration", "TTSIntegration"),
+    "video_creator": (".modules.video_creator", "VideoCreator"),
+}
+
 class AppOrchestrator:
     """Coordina todos los módulos para ejecutar el flujo de trabajo completo."""
 
     def __init__(self, config: dict):
         self.config = config
-        self.story_processor = StoryProcessor(config)
-        self.translator = StoryTranslator(config)
-        self.dialogue_analyzer = DialogueAnalyzer(config)
-        self.tts_integration = TTSIntegration(config)
-        self.video_creator = VideoCreator(config)
-        logger.info("AppOrchestrator inicializado con todos los módulos.")
+        self.pipeline_config = config.get('pipeline', {})
+        self.profiling_config = config.get('profiling', {})
+        self.audio_config = config.get('audio', {})
+        self.video_fps = config.get('video', {}).get('fps', 24)
+        # Perfil de render (video.profiles) de esta ejecución; se puede cambiar por ejecución.
+        self.render_profile: Optional[str] = config.get('video', {}).get('profile')
+        tracer.enabled = self.profiling_config.get('enabled', True)
+        tracer.rss_interval_s = self.profiling_config.get('rss_sample_ms', 50) / 1000
+        self.project_store = ProjectStore(config)
+        self.last_run_metrics: Dict[str, float] = {}
+        self._modules: Dict[str, Any] = {}
+        self._module_locks = {name: threading.Lock() for name in PIPELINE_MODULES}
+        logger.info("AppOrchestrator inicializado (los módulos se cargan al usarse).")
+
+        warm_up = self.pipeline_config.get('warm_up', [])
+        if warm_up:
+            self.warm_up(warm_up)
+
+    @property
+    def story_processor(self):
+        return self.get_module("story_processor")
+
+    @property
+    def translator(self):
+        return self.get_module("translator")
+
+    @property
+    def dialogue_analyzer(self):
+        return self.get_module("dialogue_analyzer")
+
+    @property
+    def tts_integration(self):
+        return self.get_module("tts_integration")
+
+    @property
+    def video_creator(self):
+        return self.get_module("video_creator")
+
+    def get_module(self, name: str):
+        """Importa y construye el módulo del pipeline la primera vez que se pide."""
+        instance = self._modules.get(name)
+        if instance is not None:
+            return instance
+        with self._module_locks[name]:
+            instance = self._modules.get(name)
+            if instance is None:
+                module_path, class_name = PIPELINE_MODULES[name]
+                with startup_profiler.measure("import", name):
+                    module = importlib.import_module(module_path, __package__)
+                with startup_profiler.measure("init", name):
+                    instance = getattr(module, class_name)(self.config)
+                self._modules[name] = instance
+        return instance
 
-    def run_full_pipeline(self, url: str, progress_callback: Callable[[float, str], Any]):
+    def warm_up(self, names: List[str]) -> threading.Thread:
+        """
+        Carga en segundo plano los módulos indicados (y sus modelos) para que estén
+        listos cuando el pipeline llegue a ellos. Los errores se registran y se
+        vuelven a producir cuando el pipeline use el módulo.
+        """
+        def run():
+            for name in names:
+                try:
+                    instance = self.get_module(name)
+                    if hasattr(instance, 'ensure_model_loaded'):
+                        instance.ensure_model_loaded()
+                except Exception as e:
+                    logger.warning(f"Fallo al precargar el módulo '{name}': {e}")
+
+        thread = threading.Thread(target=run, name="warm-up", daemon=True)
+        thread.start()
+        logger.info(f"Precargando en segundo plano: {names}")
+        return thread
+
+    def run_full_pipeline(self, url: str, progress_callback: Callable[[float, str], Any], resume: bool = True):
         """
         Ejecuta el pipeline completo desde la URL hasta el video final.
+
+        Cada ejecución se guarda como un proyecto bajo `paths.projects`. Si ya
+        existe un proyecto para la URL y `resume` es True, se reanuda desde la
+        última etapa completada.
         """
+        project_id = ProjectStore.project_id_for_url(url)
+        if resume and self.project_store.exists(project_id):
+            logger.info(f"Reanudando el proyecto existente '{project_id}'.")
+            return self.resume_project(project_id, progress_callback)
+
+        tracer.reset()
+
+        if self.pipeline_config.get('streaming', False):
+            return self.run_streaming_pipeline(url, progress_callback, project_id=project_id)
+
         try:
             progress_callback(0.05, "Obteniendo historia...")
-            story = self.story_processor.get_story_from_url(url)
+            project_id, story, manifest = self.open_project(url, resume=False)
+        except Exception as e:
+            logger.error(f"Ha ocurrido un error en el pipeline: {e}", exc_info=True)
+            raise
 
-            progress_callback(0.15, "Traduciendo texto...")
-            story = self.translator.translate_story(story)
+        return self._run_stages(project_id, story, manifest, progress_callback)
+
+    def resume_project(self, project_id: str, progress_callback: Callable[[float, str], Any]):
+        """
+        Reanuda un proyecto guardado: omite las etapas completadas y, en la síntesis
+        de voz, los segmentos cuyo audio ya existe.
+        """
+        tracer.reset()
+        story, manifest = self.project_store.load(project_id)
+        return self._run_stages(project_id, story, manifest, progress_callback)
+
+    def _run_stages(self, project_id: str, story: Story, manifest: Dict, progress_callback: Callable[[float, str], Any]):
+        steps = [
+            ("translated", 0.15, "Traduciendo texto..."),
+            ("analyzed", 0.40, "Analizando diálogos..."),
+            ("synthesized", 0.50, "Generando audio (puede tardar)..."),
+            ("rendered", 0.85, "Creando video final..."),
+        ]
+        try:
+            for stage, fraction, message in steps:
+                if self.is_stage_done(stage, manifest):
+                    continue
+                progress_callback(fraction, message)
+                story, manifest = self.run_stage(
+                    stage, project_id, story,
+                    lambda f, m: progress_callback(0.50 + 0.35 * f, m),
+                )
+
+            progress_callback(1.0, "¡Completado!")
+            return manifest.get('output_path')
+
+        except Exception as e:
+            logger.error(f"Ha ocurrido un error en el pipeline: {e}", exc_info=True)
+            raise
+        finally:
+            self.export_trace(project_id)
 
-            progress_callback(0.40, "Analizando diálogos...")
+    def export_trace(self, project_id: str):
+        """
+        Guarda en el directorio del proyecto las mediciones de la ejecución:
+        trace.json (resumen por etapa y eventos) y trace_chrome.json, que se
+        abre con chrome://tracing o https://ui.perfetto.dev.
+        """
+        if not tracer.enabled or not self.profiling_config.get('export_traces', True):
+            return
+        directory = self.project_store.project_dir(project_id)
+        try:
+            tracer.export_json(os.path.join(directory, "trace.json"))
+            tracer.export_chrome_trace(os.path.join(directory, "trace_chrome.json"))
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la traza de rendimiento: {e}")
+            return
+        for row in tracer.stage_summary():
+            logger.info(f"Etapa '{row['stage']}': {row['wall_s']:.2f}s reloj, {row['cpu_s']:.2f}s CPU ({row['cpu_scope']}), "
+                        f"rendimiento {row['throughput']} {row['unit'] or ''}/s")
+
+    def is_stage_done(self, stage: str, manifest: Dict) -> bool:
+        if stage not in manifest.get('stages', []):
+            return False
+        if stage == "rendered":
+            # Un render con otro perfil (p. ej. una vista previa) no cuenta como hecho.
+            if manifest.get('render_profile', self.render_profile) != self.render_profile:
+                return False
+            output_path = manifest.get('output_path')
+            return bool(output_path) and os.path.exists(output_path)
+        return True
+
+    def open_project(self, url: str, resume: bool = True) -> Tuple[str, Story, Dict]:
+        """
+        Devuelve (project_id, story, manifest) para una URL: carga el proyecto si
+        existe y `resume` es True; si no, descarga la historia y crea el proyecto.
+        """
+        project_id = ProjectStore.project_id_for_url(url)
+        if resume and self.project_store.exists(project_id):
+            story, manifest = self.project_store.load(project_id)
+            return project_id, story, manifest
+
+        story = self.story_processor.get_story_from_url(url)
+        self.project_store.invalidate_from(project_id, "fetched")
+        manifest = self.project_store.save(project_id, story, "fetched")
+        return project_id, story, manifest
+
+    def run_stage(self, stage: str, project_id: str, story: Story,
+                  progress_callback: Optional[Callable[[float, str], Any]] = None) -> Tuple[Story, Dict]:
+        """Ejecuta una sola etapa sobre la historia y guarda el proyecto al terminar."""
+        extra = {}
+        if stage == "translated":
+            story = self.translator.translate_story(story)
+        elif stage == "analyzed":
             story = self.dialogue_analyzer.analyze_story(story)
-            
-            progress_callback(0.50, "Generando audio (puede tardar)...")
-            temp_audio_dir = "data/temp_audio"
-            story = self.tts_integration.synthesize_script(story, temp_audio_dir)
+        elif stage == "synthesized":
+            self._synthesize_with_checkpoints(project_id, story, progress_callback or (lambda f, m: None))
+            assemble_story_audio(story, self.narration_path(project_id), self.audio_config, self.video_fps)
+        elif stage == "rendered":
+            output_path = self.video_creator.output_path(story, self.render_profile)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            narration_path = self.narration_path(project_id)
+            timings = load_timings(narration_path) if os.path.exists(narration_path) else None
+            if timings is None:
+                # Proyectos sintetizados antes de existir la pista de narración.
+                timings = assemble_story_audio(story, narration_path, self.audio_config, self.video_fps)
+            self.video_creator.create_video_from_story(story, output_path, narration_path, timings,
+                                                       profile=self.render_profile)
+            extra['output_path'] = output_path
+            extra['render_profile'] = self.render_profile
+        else:
+            raise ValueError(f"Etapa desconocida: {stage}")
+        manifest = self.project_store.save(project_id, story, stage, **extra)
+        return story, manifest
+
+    def narration_path(self, project_id: str) -> str:
+        """Pista de narración ensamblada del proyecto; su tabla de tiempos se guarda al lado."""
+        return os.path.join(self.project_store.audio_dir(project_id), "narration.wav")
+
+    def _synthesize_with_checkpoints(self, project_id: str, story: Story, progress_callback: Callable[[float, str], Any]):
+        """Sintetiza los segmentos que aún no tienen audio, guardando el progreso periódicamente."""
+        audio_dir = self.project_store.audio_dir(project_id)
+        checkpoint_every = self.pipeline_config.get('checkpoint_every', 10)
+        pending = [
+            i for i, dialogue in enumerate(story.script)
+            if not (dialogue.audio_path and os.path.exists(dialogue.audio_path))
+        ]
+        total = len(story.script)
+        done = total - len(pending)
+        if done:
+            logger.info(f"{done} segmentos ya sintetizados en el proyecto; quedan {len(pending)}.")
+
+        for synthesized, _ in enumerate(self.tts_integration.synthesize_stream(story, pending, audio_dir), start=1):
+            if synthesized % checkpoint_every == 0:
+                self.project_store.save(project_id, story)
+            progress_callback((done + synthesized) / max(1, total), f"Segmento {done + synthesized}/{total} sintetizado")
+
+    def run_streaming_pipeline(self, url: str, progress_callback: Callable[[float, str], Any], project_id: Optional[str] = None):
+        """
+        Ejecuta el pipeline con las etapas solapadas: los párrafos traducidos se
+        analizan a medida que llegan, cada entrada del guion pasa directamente a
+        la síntesis de voz, y el audio listo se añade en orden a la pista de
+        narración. Las etapas se comunican por colas acotadas, de modo que la
+        duración total se acerca a la de la etapa más lenta.
+
+        El resultado se guarda como proyecto; si la ejecución se interrumpe, el
+        proyecto se reanuda con el pipeline por etapas.
+        """
+        queue_size = self.pipeline_config.get('queue_size', 32)
+        chunk_size = self.pipeline_config.get('translation_chunk_size', 8)
+        project_id = project_id or ProjectStore.project_id_for_url(url)
+        temp_audio_dir = self.project_store.audio_dir(project_id)
+        start = time.perf_counter()
+        stop = threading.Event()
+        errors: List[Exception] = []
+        metrics: Dict[str, float] = {}
+        self.last_run_metrics = metrics
+
+        def put(q: queue.Queue, item):
+            # Evita bloquear una etapa para siempre si otra ha fallado.
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def get(q: queue.Queue):
+            while True:
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return _END
+
+        try:
+            progress_callback(0.05, "Obteniendo historia...")
+            story = self.story_processor.get_story_from_url(url)
+            self.project_store.invalidate_from(project_id, "fetched")
+            self.project_store.save(project_id, story, "fetched")
+            paragraphs = [p.strip() for p in story.original_text.split('\n\n') if p.strip()]
+            translated_paragraphs: List[str] = []
+            story.characters = []
+            story.script = []
+
+            translated_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+            segment_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+
+            def translate_stage():
+                try:
+                    with tracer.span("translated", "stage", streaming=True) as span:
+                        span.items, span.unit = len(paragraphs), "párrafos"
+                        for translated in self.translator.translate_stream(paragraphs, chunk_size):
+                            put(translated_queue, translated)
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+                finally:
+                    put(translated_queue, _END)
+
+            def analyze_stage():
+                last_speaker_id = "narrator"
+                try:
+                    with tracer.span("analyzed", "stage", streaming=True) as span:
+                        span.unit = "párrafos"
+                        while (paragraph := get(translated_queue)) is not _END:
+                            translated_paragraphs.append(paragraph)
+                            entries, last_speaker_id = self.dialogue_analyzer.analyze_paragraph(
+                                paragraph, story.characters, last_speaker_id
+                            )
+                            for entry in entries:
+                                story.script.append(entry)
+                                put(segment_queue, len(story.script) - 1)
+                        span.items = len(translated_paragraphs)
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+                finally:
+                    put(segment_queue, _END)
+
+            def segment_indices() -> Iterator[int]:
+                while (index := get(segment_queue)) is not _END:
+                    yield index
+
+            # Las etapas de los hilos se miden en la sesión de traza de quien lanza el pipeline.
+            stages = [
+                threading.Thread(target=tracer.bind(translate_stage), name="pipeline-translate", daemon=True),
+                threading.Thread(target=tracer.bind(analyze_stage), name="pipeline-analyze", daemon=True),
+            ]
+            for stage in stages:
+                stage.start()
+
+            progress_callback(0.10, "Traduciendo, analizando y sintetizando en paralelo...")
+            assembler = AudioAssembler(self.narration_path(project_id), self.audio_config, self.video_fps)
+            synthesized = 0
+            for index in self.tts_integration.synthesize_stream(story, segment_indices(), temp_audio_dir):
+                synthesized += 1
+                assembler.add(index, story.script[index].audio_path)
+                if 'time_to_first_audio_s' not in metrics and assembler.appended:
+                    metrics['time_to_first_audio_s'] = time.perf_counter() - start
+                    logger.info(f"Primer audio disponible a los {metrics['time_to_first_audio_s']:.1f} s.")
+                analyzed_fraction = len(translated_paragraphs) / max(1, len(paragraphs))
+                fraction = analyzed_fraction * synthesized / max(1, len(story.script))
+                progress_callback(0.10 + 0.75 * fraction, f"Segmento {synthesized} sintetizado")
+
+            for stage in stages:
+                stage.join()
+            if errors:
+                raise errors[0]
+
+            timings = assembler.close()
+            story.translated_text = "\n\n".join(translated_paragraphs)
+            metrics['pipeline_s'] = time.perf_counter() - start
+            logger.info(f"Personajes identificados: {[c.name for c in story.characters]}")
+            self.project_store.save(project_id, story, "translated", "analyzed", "synthesized")
 
             progress_callback(0.85, "Creando video final...")
-            output_path = f"data/output/{story.title.replace(' ', '_')}.mp4"
-            self.video_creator.create_video_from_story(story, output_path)
-            
+            output_path = self.video_creator.output_path(story, self.render_profile)
+            self.video_creator.create_video_from_story(story, output_path, self.narration_path(project_id), timings,
+                                                       profile=self.render_profile)
+            self.project_store.save(project_id, story, "rendered", output_path=output_path,
+                                    render_profile=self.render_profile)
+            metrics['total_s'] = time.perf_counter() - start
+            logger.info(f"Métricas del pipeline en streaming: {metrics}")
+
             progress_callback(1.0, "¡Completado!")
             return output_path
 
         except Exception as e:
             logger.error(f"Ha ocurrido un error en el pipeline: {e}", exc_info=True)
             raise
+        finally:
+            stop.set()
+            self.export_trace(project_id)
@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .app_logic import AppOrchestrator
+
+logger = logging.getLogger(__name__)
+
+# Etapas que recorre cada trabajo después de abrir (o descargar) el proyecto.
+BATCH_STAGES = ["translated", "analyzed", "synthesized", "rendered"]
+
+# Concurrencia por defecto de cada etapa. Las etapas con modelos (traducción,
+# análisis, voz) usan un único hilo porque comparten una sola instancia del modelo.
+DEFAULT_CONCURRENCY = {"fetched": 4, "translated": 1, "analyzed": 1, "synthesized": 1, "rendered": 1}
+
+_STOP = object()
+
+class BatchRunner:
+    """
+    Procesa una cola de URLs sin interfaz gráfica.
+
+    Cada etapa tiene su propio grupo de hilos y una cola de entrada, de forma
+    que varias historias avanzan a la vez (la traducción de una se solapa con
+    la síntesis de voz de otra) usando un único AppOrchestrator, es decir, cada
+    modelo se carga una sola vez. Al terminar cada historia se reescribe un
+    informe JSON con su estado, los tiempos por etapa y la ruta del video.
+    """
+
+    def __init__(self, orchestrator: AppOrchestrator, report_path: str,
+                 concurrency: Optional[Dict[str, int]] = None, resume: bool = True):
+        self.orchestrator = orchestrator
+        self.report_path = report_path
+        self.concurrency = {**DEFAULT_CONCURRENCY, **(concurrency or {})}
+        self.resume = resume
+        self.report: List[Dict] = []
+        self._report_lock = threading.Lock()
+
+    def run(self, urls: List[str]) -> List[Dict]:
+        stages = ["fetched"] + BATCH_STAGES
+        queues = {stage: queue.Queue() for stage in stages}
+        finished: queue.Queue = queue.Queue()
+        self.report = []
+
+        threads = []
+        for position, stage in enumerate(stages):
+            next_queue = queues[stages[position + 1]] if position + 1 < len(stages) else None
+            for n in range(self.concurrency[stage]):
+                thread = threading.Thread(
+                    target=self._stage_worker,
+                    args=(stage, queues[stage], next_queue, finished),
+                    name=f"batch-{stage}-{n}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        logger.info(f"Procesando {len(urls)} URLs en modo por lotes.")
+        for url in urls:
+            queues["fetched"].put({
+                "url": url,
+                "project_id": None,
+                "status": "pending",
+                "error": None,
+                "timings": {},
+                "output_path": None,
+            })
+
+        for _ in urls:
+            job = finished.get()
+            self._record(job)
+            logger.info(f"[{len(self.report)}/{len(urls)}] {job['url']}: {job['status']}")
+
+        for stage in stages:
+            for _ in range(self.concurrency[stage]):
+                queues[stage].put(_STOP)
+        for thread in threads:
+            thread.join()
+        return self.report
+
+    def _stage_worker(self, stage: str, inbox: queue.Queue, outbox: Optional[queue.Queue], finished: queue.Queue):
+        while (job := inbox.get()) is not _STOP:
+            start = time.perf_counter()
+            try:
+                if stage == "fetched":
+                    job["project_id"], job["story"], job["manifest"] = self.orchestrator.open_project(job["url"], self.resume)
+                elif not self.orchestrator.is_stage_done(stage, job["manifest"]):
+                    job["story"], job["manifest"] = self.orchestrator.run_stage(stage, job["project_id"], job["story"])
+                else:
+                    job["timings"][stage] = 0.0
+                    self._forward(job, outbox, finished)
+                    continue
+            except Exception as e:
+                logger.error(f"Error en la etapa '{stage}' para {job['url']}: {e}", exc_info=True)
+                job["status"] = "error"
+                job["error"] = f"{stage}: {e}"
+                job["timings"][stage] = time.perf_counter() - start
+                finished.put(job)
+                continue
+
+            job["timings"][stage] = time.perf_counter() - start
+            self._forward(job, outbox, finished)
+
+    @staticmethod
+    def _forward(job: Dict, outbox: Optional[queue.Queue], finished: queue.Queue):
+        if outbox is not None:
+            outbox.put(job)
+            return
+        job["status"] = "ok"
+        job["output_path"] = job["manifest"].get("output_path")
+        finished.put(job)
+
+    def _record(self, job: Dict):
+        entry = {key: job[key] for key in ("url", "project_id", "status", "error", "timings", "output_path")}
+        with self._report_lock:
+            self.report.append(entry)
+            directory = os.path.dirname(self.report_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.report_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.report, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.report_path)
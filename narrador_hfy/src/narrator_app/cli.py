@@ -0,0 +1,109 @@
+import argparse
+import logging
+import os
+import sys
+from typing import List, Optional
+
+from .config import Config
+from .utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+def _read_urls(path: str) -> List[str]:
+    """Lee una URL por línea, ignorando líneas vacías y comentarios (#)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def _run_batch(args: argparse.Namespace) -> int:
+    # Importaciones diferidas: cargan los módulos pesados solo al ejecutar el comando.
+    from .app_logic import AppOrchestrator
+    from .batch import BatchRunner
+
+    config = Config(args.config).get_config()
+    urls = _read_urls(args.urls_file)
+    if not urls:
+        logger.error(f"No se encontraron URLs en {args.urls_file}")
+        return 1
+
+    batch_config = config.get('batch', {})
+    if args.profile:
+        profiles = config.get('video', {}).get('profiles', {})
+        if args.profile not in profiles:
+            logger.error(f"Perfil de render desconocido: '{args.profile}'. Disponibles: {', '.join(profiles)}")
+            return 1
+    orchestrator = AppOrchestrator(config)
+    if args.profile:
+        orchestrator.render_profile = args.profile
+    if args.series:
+        urls = _expand_series(orchestrator, urls, resume=not args.no_resume)
+    runner = BatchRunner(
+        orchestrator,
+        report_path=args.report or batch_config.get('report_path', 'data/output/batch_report.json'),
+        concurrency=batch_config.get('concurrency'),
+        resume=not args.no_resume,
+    )
+    report = runner.run(urls)
+    if args.trace:
+        from .profiling import tracer
+        tracer.export_json(os.path.join(args.trace, "trace.json"))
+        tracer.export_chrome_trace(os.path.join(args.trace, "trace_chrome.json"))
+        logger.info(f"Trazas de rendimiento guardadas en {args.trace}")
+
+    failed = [entry for entry in report if entry['status'] != 'ok']
+    logger.info(f"Lote terminado: {len(report) - len(failed)} correctas, {len(failed)} con error. Informe: {runner.report_path}")
+    return 1 if failed else 0
+
+def _expand_series(orchestrator, urls: List[str], resume: bool) -> List[str]:
+    """
+    Sustituye cada URL por todos los capítulos de su serie, en orden. Los
+    capítulos descargados se guardan como proyectos en la etapa 'fetched',
+    así el lote no vuelve a pedirlos (salvo con --no-resume, que descarga de
+    nuevo cada historia).
+    """
+    from .modules.series_crawler import SeriesCrawler
+    from .project_store import ProjectStore
+
+    crawler = SeriesCrawler(orchestrator.config, orchestrator.story_processor)
+    chapter_urls: List[str] = []
+    for url in urls:
+        for story in crawler.crawl(url):
+            if story.url in chapter_urls:
+                continue
+            chapter_urls.append(story.url)
+            project_id = ProjectStore.project_id_for_url(story.url)
+            if not (resume and orchestrator.project_store.exists(project_id)):
+                orchestrator.project_store.save(project_id, story, "fetched")
+    logger.info(f"Series expandidas: {len(urls)} URLs -> {len(chapter_urls)} capítulos.")
+    return chapter_urls
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="narrator_app", description="Narrador de Historias HFY (línea de comandos).")
+    parser.add_argument('--config', default='config.yaml', help="Ruta al archivo de configuración.")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="Muestra al terminar el tiempo de importación y carga de cada módulo.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch = subparsers.add_parser('batch', help="Procesa en cola todas las URLs de un archivo de texto.")
+    batch.add_argument('urls_file', help="Archivo con una URL de r/HFY por línea.")
+    batch.add_argument('--report', help="Ruta del informe JSON (por defecto, batch.report_path).")
+    batch.add_argument('--no-resume', action='store_true', help="Ignora los proyectos guardados y empieza de cero.")
+    batch.add_argument('--series', action='store_true',
+                       help="Trata cada URL como el inicio de una serie y procesa todos sus capítulos.")
+    batch.add_argument('--profile', metavar='NOMBRE',
+                       help="Perfil de render de video.profiles (p. ej. preview, final o podcast).")
+    batch.add_argument('--trace', metavar='DIR', help="Guarda en DIR las trazas de rendimiento de todo el lote.")
+    batch.set_defaults(func=_run_batch)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    setup_logging()
+    try:
+        return args.func(args)
+    finally:
+        if args.startup_report:
+            from .profiling import startup_profiler
+            print(startup_profiler.format_report())
+
+if __name__ == "__main__":
+    sys.exit(main())
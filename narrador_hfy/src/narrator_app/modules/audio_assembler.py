@@ -0,0 +1,220 @@
+import json
+import logging
+import math
+import os
+import wave
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydub import AudioSegment
+
+from ..data_structures import Story
+from ..profiling import tracer
+from ..utils import TTSError
+
+logger = logging.getLogger(__name__)
+
+def timings_path_for(narration_path: str) -> str:
+    """Ruta de la tabla de tiempos que acompaña a una pista de narración."""
+    return f"{os.path.splitext(narration_path)[0]}.timings.json"
+
+def load_timings(narration_path: str) -> Optional[List[Tuple[int, float, float]]]:
+    """Lee la tabla de tiempos guardada junto a la pista, o None si no existe."""
+    try:
+        with open(timings_path_for(narration_path), 'r', encoding='utf-8') as f:
+            return [tuple(row) for row in json.load(f)["timings"]]
+    except (OSError, ValueError, KeyError):
+        return None
+
+class AudioAssembler:
+    """
+    Une los audios de los segmentos en una única pista maestra, en el orden del
+    guion, a medida que van llegando (aunque lleguen desordenados).
+
+    Cada segmento se lee y se escribe por bloques de `chunk_ms`, de modo que la
+    memoria no depende de la longitud de la historia. Opcionalmente normaliza
+    el volumen de cada segmento a `target_dbfs` (sin superar `max_peak_dbfs`),
+    añade `gap_ms` de silencio entre segmentos y, sin silencio, los funde con
+    un fundido cruzado de `crossfade_ms`.
+
+    Mantiene una tabla de tiempos (índice, inicio, fin) en segundos que la etapa
+    de video usa para sincronizar los subtítulos. Con `video_fps`, cada segmento
+    empieza en el borde de un fotograma del video (rellenando con silencio), de
+    modo que cambiar la duración de un segmento desplaza los siguientes un
+    número entero de fotogramas y los tramos de video en caché siguen valiendo.
+    """
+
+    def __init__(self, output_path: str, audio_config: Optional[Dict] = None, video_fps: Optional[float] = None):
+        audio_config = audio_config or {}
+        self.output_path = output_path
+        self.target_dbfs: Optional[float] = audio_config.get('target_dbfs')
+        self.max_peak_dbfs = audio_config.get('max_peak_dbfs', -1.0)
+        self.gap_ms = audio_config.get('gap_ms', 0)
+        self.crossfade_ms = audio_config.get('crossfade_ms', 0) if not self.gap_ms else 0
+        self.chunk_ms = max(audio_config.get('chunk_ms', 1000), 2 * self.crossfade_ms)
+        # Con fundido cruzado los segmentos se solapan y no se pueden alinear.
+        align = audio_config.get('align_to_video_frames', True) and not self.crossfade_ms
+        self.video_fps = video_fps if align else None
+        self.timings: List[Tuple[int, float, float]] = []
+        self._ready: Dict[int, Optional[str]] = {}
+        self._next_index = 0
+        self._writer: Optional[wave.Wave_write] = None
+        self._params = None
+        self._position = 0.0
+        # Final del segmento anterior, pendiente de escribir hasta fundirlo con el siguiente.
+        self._tail: Optional[AudioSegment] = None
+        # Duración del segmento anterior (ms): el fundido no puede ser más largo, o
+        # alcanzaría audio de segmentos anteriores y desordenaría la tabla de tiempos.
+        self._previous_ms = 0.0
+
+    def add(self, index: int, audio_path: Optional[str]):
+        """Registra el audio de un segmento (None si falló) y vuelca el prefijo contiguo listo."""
+        self._ready[index] = audio_path
+        while self._next_index in self._ready:
+            path = self._ready.pop(self._next_index)
+            if path:
+                self._append(self._next_index, path)
+            self._next_index += 1
+
+    def _open_writer(self, params):
+        directory = os.path.dirname(self.output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._writer = wave.open(self.output_path, 'wb')
+        self._writer.setnchannels(params.nchannels)
+        self._writer.setsampwidth(params.sampwidth)
+        self._writer.setframerate(params.framerate)
+        self._params = params
+
+    def _read_chunks(self, path: str) -> Iterator[AudioSegment]:
+        """Lee el WAV por bloques, convertidos al formato de la pista maestra."""
+        with wave.open(path, 'rb') as segment:
+            params = segment.getparams()
+            frames_per_chunk = max(1, int(params.framerate * self.chunk_ms / 1000))
+            while True:
+                frames = segment.readframes(frames_per_chunk)
+                if not frames:
+                    return
+                chunk = AudioSegment(data=frames, sample_width=params.sampwidth,
+                                     frame_rate=params.framerate, channels=params.nchannels)
+                if params[:3] != self._params[:3]:
+                    chunk = (chunk.set_channels(self._params.nchannels)
+                                  .set_sample_width(self._params.sampwidth)
+                                  .set_frame_rate(self._params.framerate))
+                yield chunk
+
+    def _gain_db(self, path: str) -> float:
+        """Ganancia que lleva el segmento a target_dbfs, limitada para no saturar los picos."""
+        if self.target_dbfs is None:
+            return 0.0
+        squares = 0.0
+        samples = 0
+        peak = 0
+        max_amplitude = None
+        for chunk in self._read_chunks(path):
+            count = int(chunk.frame_count()) * chunk.channels
+            squares += float(chunk.rms) ** 2 * count
+            samples += count
+            peak = max(peak, chunk.max)
+            max_amplitude = chunk.max_possible_amplitude
+        if not samples or not peak:
+            return 0.0  # Silencio: no hay nada que normalizar.
+        dbfs = 20 * math.log10(math.sqrt(squares / samples) / max_amplitude)
+        peak_dbfs = 20 * math.log10(peak / max_amplitude)
+        return min(self.target_dbfs - dbfs, self.max_peak_dbfs - peak_dbfs)
+
+    def _write(self, audio: AudioSegment):
+        self._writer.writeframes(audio.raw_data)
+
+    def _write_silence(self, seconds: float):
+        n_frames = int(round(seconds * self._params.framerate))
+        if n_frames > 0:
+            self._writer.writeframes(b'\x00' * n_frames * self._params.nchannels * self._params.sampwidth)
+            self._position += n_frames / float(self._params.framerate)
+
+    def _append(self, index: int, path: str):
+        try:
+            with wave.open(path, 'rb') as segment:
+                if self._writer is None:
+                    self._open_writer(segment.getparams())
+            gain = self._gain_db(path)
+            chunks = self._read_chunks(path)
+        except (wave.Error, EOFError, OSError) as e:
+            raise TTSError(f"No se pudo leer el audio del segmento {index}: {e}") from e
+
+        if self.timings:
+            silence = self.gap_ms / 1000.0
+            if self.video_fps:
+                # Hasta el siguiente borde de fotograma (la tolerancia evita saltar uno entero).
+                next_frame = math.ceil((self._position + silence) * self.video_fps - 1e-3)
+                silence = next_frame / self.video_fps - self._position
+            self._write_silence(silence)
+
+        start = self._position
+        duration = 0.0
+        buffer: Optional[AudioSegment] = None
+        for chunk in chunks:
+            if gain:
+                chunk = chunk.apply_gain(gain)
+            duration += chunk.frame_count() / chunk.frame_rate
+            if self._tail is not None:
+                # Primer bloque: se solapa con el final del segmento anterior.
+                overlap = int(min(self.crossfade_ms, self._previous_ms, len(self._tail), len(chunk)))
+                start -= overlap / 1000.0
+                chunk = self._tail.append(chunk, crossfade=overlap) if overlap else self._tail + chunk
+                self._tail = None
+            buffer = chunk if buffer is None else buffer + chunk
+            # Se retiene el final del segmento por si hay que fundirlo con el siguiente.
+            if len(buffer) > self.chunk_ms + self.crossfade_ms:
+                keep = self.crossfade_ms
+                self._write(buffer[:-keep] if keep else buffer)
+                buffer = buffer[-keep:] if keep else None
+
+        if buffer is not None:
+            if self.crossfade_ms and len(buffer) > self.crossfade_ms:
+                self._write(buffer[:-self.crossfade_ms])
+                buffer = buffer[-self.crossfade_ms:]
+            if self.crossfade_ms:
+                self._tail = buffer
+            else:
+                self._write(buffer)
+        self._position = start + duration
+        self._previous_ms = duration * 1000
+        self.timings.append((index, start, self._position))
+
+    @property
+    def appended(self) -> int:
+        return len(self.timings)
+
+    @property
+    def duration(self) -> float:
+        return self._position
+
+    def close(self) -> List[Tuple[int, float, float]]:
+        """Cierra la pista maestra, guarda la tabla de tiempos a su lado y la devuelve."""
+        if self._ready:
+            logger.warning(f"Segmentos sin volcar a la pista maestra: {sorted(self._ready)}")
+        if self._writer is not None:
+            if self._tail is not None:
+                self._write(self._tail)
+                self._tail = None
+            self._writer.close()
+            self._writer = None
+            with open(timings_path_for(self.output_path), 'w', encoding='utf-8') as f:
+                json.dump({"duration": self._position, "timings": self.timings}, f)
+        return self.timings
+
+def assemble_story_audio(story: Story, output_path: str, audio_config: Optional[Dict] = None,
+                         video_fps: Optional[float] = None) -> List[Tuple[int, float, float]]:
+    """Ensambla la narración de todos los segmentos con audio y devuelve su tabla de tiempos."""
+    with tracer.span("assembled", "stage") as span:
+        assembler = AudioAssembler(output_path, audio_config, video_fps)
+        for index, dialogue in enumerate(story.script):
+            audio_path = dialogue.audio_path
+            if not audio_path or not os.path.exists(audio_path):
+                logger.warning(f"Saltando segmento sin audio: {dialogue.text[:30]}...")
+                audio_path = None
+            assembler.add(index, audio_path)
+        timings = assembler.close()
+        span.items, span.unit = assembler.duration, "audio_s"
+    logger.info(f"Narración ensamblada: {len(timings)} segmentos, {assembler.duration:.1f} s.")
+    return timings
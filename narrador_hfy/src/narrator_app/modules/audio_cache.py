@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+class AudioCache:
+    """
+    Caché de audio sintetizado, direccionada por contenido.
+
+    Cada WAV se guarda bajo una clave derivada de (texto, hash de la voz, idioma,
+    modelo), de modo que al volver a sintetizar una historia solo se generan los
+    segmentos cuyas entradas cambiaron. Un índice SQLite registra el tamaño y el
+    último uso de cada entrada para aplicar expulsión LRU por bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite3'), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS audio ("
+            " key TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_audio_last_used ON audio(last_used)")
+        self._conn.commit()
+        logger.info(f"Caché de audio abierta en: {cache_dir}")
+
+    @staticmethod
+    def make_key(text: str, voice_hash: str, language: str, model_name: str) -> str:
+        payload = "\x1e".join([model_name, language, voice_hash, text])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.wav")
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Copia el audio en caché a output_path. Devuelve False si no existe."""
+        path = self._path(key)
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM audio WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.exists(path):
+                self.misses += 1
+                return False
+            shutil.copyfile(path, output_path)
+            self._conn.execute("UPDATE audio SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return True
+
+    def store(self, key: str, audio_path: str):
+        """Guarda una copia de un audio recién sintetizado y aplica el límite de tamaño."""
+        path = self._path(key)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(audio_path, path)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO audio (key, size, last_used) VALUES (?, ?, ?)",
+                (key, os.path.getsize(path), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM audio").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM audio ORDER BY last_used ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self._conn.execute("DELETE FROM audio WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"Caché de audio llena, {evicted} entradas expulsadas.")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM audio").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,13 +1,21 @@
 import logging
 import re
-import spacy
-from typing import Dict, List, Set
+from typing import Dict, List, Set, Tuple
 
 from ..data_structures import Story, Dialogue, Character
+from ..profiling import startup_profiler, tracer
 from ..utils import AnalysisError
 
 logger = logging.getLogger(__name__)
 
+# Componentes de spaCy de los que dependen la NER, los lemas y el árbol de dependencias.
+REQUIRED_COMPONENTS = {"transformer", "tok2vec", "tagger", "morphologizer", "attribute_ruler",
+                       "lemmatizer", "parser", "ner"}
+# De los anteriores, los que se pueden desactivar con disable_components: sin el
+# parser, el hablante se busca solo por su nombre tras la cita. Sin los demás, el
+# análisis dejaría de encontrar personajes (NER) o verbos de habla (lemas).
+OPTIONAL_COMPONENTS = {"parser"}
+
 class DialogueAnalyzer:
     """
     Analiza una historia para identificar personajes, extraer diálogos,
@@ -20,13 +28,32 @@ class DialogueAnalyzer:
         
         try:
             logger.info(f"Cargando modelo de spaCy: {self.model_name}...")
-            self.nlp = spacy.load(self.model_name)
+            with startup_profiler.measure("load", "dialogue_analyzer"):
+                import spacy
+
+                self.nlp = spacy.load(self.model_name)
             logger.info("Modelo de spaCy cargado correctamente.")
         except OSError:
             logger.error(f"Modelo de spaCy '{self.model_name}' no encontrado.")
             logger.info(f"Por favor, descárgalo ejecutando: python -m spacy download {self.model_name}")
             raise AnalysisError(f"Modelo de spaCy no encontrado: {self.model_name}")
 
+        # Solo se usan entidades (NER), lemas y dependencias: el resto de
+        # componentes del modelo se desactiva para no pagar su coste.
+        unused = [name for name in self.nlp.pipe_names if name not in REQUIRED_COMPONENTS]
+        for name in self.config.get('disable_components', []):
+            if name in REQUIRED_COMPONENTS and name not in OPTIONAL_COMPONENTS:
+                logger.warning(f"El componente de spaCy '{name}' es necesario para el análisis; no se desactiva.")
+            elif name in self.nlp.pipe_names:
+                unused.append(name)
+        for name in dict.fromkeys(unused):
+            self.nlp.disable_pipe(name)
+        if unused:
+            logger.info(f"Componentes de spaCy desactivados: {list(dict.fromkeys(unused))}")
+
+        self.batch_size = self.config.get('batch_size', 64)
+        self.n_process = self.config.get('n_process', 1)
+
         self.dialogue_pattern = re.compile(r'["«“]([^"»”]+)["»”]')
         self.speech_verbs = {'dijo', 'preguntó', 'respondió', 'gritó', 'susurró', 'exclamó'}
 
@@ -37,23 +64,38 @@ class DialogueAnalyzer:
 
         logger.info(f"Iniciando análisis de diálogos para: '{story.title}'")
         
-        doc = self.nlp(story.translated_text)
-        
-        characters = self._identify_characters(doc)
-        story.characters = characters
-        logger.info(f"Personajes identificados: {[c.name for c in characters]}")
+        with tracer.span("analyzed", "stage") as span:
+            paragraphs = story.translated_text.split('\n\n')
+            span.items, span.unit = len(paragraphs), "párrafos"
+            with tracer.span("nlp.pipe", batch_size=self.batch_size, n_process=self.n_process):
+                docs = self._parse_paragraphs(paragraphs)
+
+            characters = self._identify_characters(docs)
+            story.characters = characters
+            logger.info(f"Personajes identificados: {[c.name for c in characters]}")
+
+            script = self._create_script(docs, characters)
 
-        script = self._create_script(doc, characters)
         story.script = script
         logger.info(f"Guion creado con {len(script)} entradas.")
 
         return story
 
-    def _identify_characters(self, doc) -> List[Character]:
+    def _parse_paragraphs(self, paragraphs: List[str]) -> List:
+        """
+        Analiza los párrafos por lotes con nlp.pipe en lugar de como un único Doc,
+        de modo que el coste crece linealmente, no se alcanza `nlp.max_length`
+        en historias largas y, con `n_process` > 1, se usan varios núcleos.
+        """
+        return list(self.nlp.pipe(paragraphs, batch_size=self.batch_size, n_process=self.n_process))
+
+    def _identify_characters(self, docs) -> List[Character]:
+        """Reúne las entidades de persona de todos los párrafos analizados."""
         char_names = set()
-        for ent in doc.ents:
-            if ent.label_ == "PER":
-                char_names.add(ent.text)
+        for doc in docs:
+            for ent in doc.ents:
+                if ent.label_ == "PER":
+                    char_names.add(ent.text)
         
         characters = [
             Character(id=name.lower().replace(" ", "_"), name=name, voice_archetype="default")
@@ -61,59 +103,86 @@ class DialogueAnalyzer:
         ]
         return characters
 
-    def _create_script(self, doc, characters: List[Character]) -> List[Dialogue]:
+    def analyze_paragraph(self, paragraph: str, characters: List[Character], last_speaker_id: str = "narrator") -> Tuple[List[Dialogue], str]:
+        """
+        Analiza un único párrafo de forma incremental: añade a `characters` los
+        personajes nuevos que aparezcan y devuelve las entradas de guion del
+        párrafo junto con el último hablante, para encadenar párrafos sucesivos.
+        """
+        doc = self.nlp(paragraph)
+        known = {c.id for c in characters}
+        for character in self._identify_characters([doc]):
+            if character.id not in known:
+                characters.append(character)
+                known.add(character.id)
+
+        char_map = {c.name: c.id for c in characters}
+        return self._script_paragraph(doc, char_map, last_speaker_id)
+
+    def _create_script(self, docs, characters: List[Character]) -> List[Dialogue]:
         script: List[Dialogue] = []
         char_map = {c.name: c.id for c in characters}
         last_speaker_id = "narrator"
 
-        paragraphs = doc.text.split('\n\n')
+        # Cada párrafo ya está analizado; la atribución de hablantes reutiliza sus tokens.
+        for doc in docs:
+            entries, last_speaker_id = self._script_paragraph(doc, char_map, last_speaker_id)
+            script.extend(entries)
+
+        return script
 
-        for paragraph in paragraphs:
-            if not paragraph.strip():
-                continue
+    def _script_paragraph(self, doc, char_map: Dict[str, str], last_speaker_id: str) -> Tuple[List[Dialogue], str]:
+        script: List[Dialogue] = []
+        paragraph = doc.text
+        if not paragraph.strip():
+            return script, last_speaker_id
 
-            matches = list(self.dialogue_pattern.finditer(paragraph))
-            
-            if not matches:
-                script.append(Dialogue(text=paragraph, character_id="narrator"))
-                last_speaker_id = "narrator"
-            else:
-                last_match_end = 0
-                for match in matches:
-                    start, end = match.span()
-                    
-                    narrator_text = paragraph[last_match_end:start].strip()
-                    if narrator_text:
-                        script.append(Dialogue(text=narrator_text, character_id="narrator"))
-
-                    dialogue_text = match.group(1).strip()
-                    
-                    context_text = paragraph[end:].strip()
-                    speaker_id = self._find_speaker_in_context(context_text, char_map)
-
-                    if speaker_id:
-                        last_speaker_id = speaker_id
-                    
-                    script.append(Dialogue(text=dialogue_text, character_id=last_speaker_id))
-                    last_match_end = end
+        matches = list(self.dialogue_pattern.finditer(paragraph))
+        
+        if not matches:
+            script.append(Dialogue(text=paragraph, character_id="narrator"))
+            last_speaker_id = "narrator"
+        else:
+            last_match_end = 0
+            for match in matches:
+                start, end = match.span()
                 
-                final_narrator_text = paragraph[last_match_end:].strip()
-                if final_narrator_text:
-                    script.append(Dialogue(text=final_narrator_text, character_id="narrator"))
+                narrator_text = paragraph[last_match_end:start].strip()
+                if narrator_text:
+                    script.append(Dialogue(text=narrator_text, character_id="narrator"))
 
-        return script
+                dialogue_text = match.group(1).strip()
+                
+                context_span = doc.char_span(end, len(paragraph), alignment_mode='expand')
+                speaker_id = self._find_speaker_in_context(context_span, char_map)
+
+                if speaker_id:
+                    last_speaker_id = speaker_id
+                
+                script.append(Dialogue(text=dialogue_text, character_id=last_speaker_id))
+                last_match_end = end
+            
+            final_narrator_text = paragraph[last_match_end:].strip()
+            if final_narrator_text:
+                script.append(Dialogue(text=final_narrator_text, character_id="narrator"))
+
+        return script, last_speaker_id
+
+    def _find_speaker_in_context(self, context, char_map: Dict[str, str]) -> str | None:
+        """Busca el hablante en el tramo (Span) del documento que sigue a la cita."""
+        if context is None or len(context) == 0:
+            return None
 
-    def _find_speaker_in_context(self, context: str, char_map: Dict[str, str]) -> str | None:
-        context_doc = self.nlp(context)
-        for token in context_doc:
+        for token in context:
             if token.lemma_ in self.speech_verbs:
                 for child in token.children:
-                    if child.dep_ == "nsubj":
+                    if child.dep_ == "nsubj" and context.start <= child.i < context.end:
                         if child.text in char_map:
                             return char_map[child.text]
         
+        context_text = context.text
         for name, char_id in char_map.items():
-            if name in context:
+            if name in context_text:
                 return char_id
         
         return None
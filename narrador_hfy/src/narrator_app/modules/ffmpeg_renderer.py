@@ -0,0 +1,552 @@
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageColor
+
+from ..data_structures import Story
+from ..profiling import run_subprocess, tracer
+from ..utils import VideoError
+from .subtitle_renderer import SubtitleRenderer
+from .video_chunk_cache import VideoChunkCache
+
+logger = logging.getLogger(__name__)
+
+# Evento de subtítulo: (estilo, inicio, fin, texto sin escapar); los tiempos en segundos o en fotogramas.
+SubtitleEvent = Tuple[str, float, float, str]
+
+# Códec de audio por formato de salida de los perfiles sin video.
+AUDIO_CODECS = {
+    'm4a': ['-c:a', 'aac', '-movflags', '+faststart'],
+    'opus': ['-c:a', 'libopus'],
+}
+
+# Huella del contenido de cada fondo. Clave: (ruta, mtime, tamaño).
+_digest_cache: Dict[Tuple[str, float, int], str] = {}
+
+# Cachés de tramos abiertas, por ruta: los VideoCreator de cada perfil comparten la misma.
+_chunk_caches: Dict[str, VideoChunkCache] = {}
+_chunk_caches_lock = threading.Lock()
+
+# Versión (mayor, menor) de cada binario de ffmpeg; None si no se pudo leer.
+_ffmpeg_versions: Dict[str, Optional[Tuple[int, int]]] = {}
+FFMPEG_VERSION_RE = re.compile(r'ffmpeg version n?(\d+)\.(\d+)')
+
+def wav_duration(path: str) -> float:
+    """Duración en segundos de un archivo WAV, leyendo solo su cabecera."""
+    with wave.open(path, 'rb') as wav:
+        return wav.getnframes() / float(wav.getframerate())
+
+def file_digest(path: str) -> str:
+    """SHA-256 del contenido de un archivo, calculado una sola vez por versión del archivo."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+    digest = _digest_cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digest = _digest_cache[key] = sha.hexdigest()
+    return digest
+
+def format_ass_time(seconds: float) -> str:
+    centiseconds = int(round(seconds * 100))
+    hours, rest = divmod(centiseconds, 360000)
+    minutes, rest = divmod(rest, 6000)
+    secs, cs = divmod(rest, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{cs:02d}"
+
+def ass_color(color: str) -> str:
+    """Convierte un color (nombre o #RRGGBB) al formato &H00BBGGRR de ASS."""
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+def escape_ass_text(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('{', '(').replace('}', ')').replace('\n', '\\N')
+
+def concat_list_line(path: str) -> str:
+    """Línea `file '...'` del demuxer concat, con la ruta escapada."""
+    escaped = os.path.abspath(path).replace('\\', '/').replace("'", "'\\''")
+    return f"file '{escaped}'\n"
+
+class FFmpegRenderer:
+    """
+    Motor de render rápido basado en ffmpeg.
+
+    Toma la pista de narración ya ensamblada y su tabla de tiempos, genera
+    subtítulos ASS con esos tiempos, y deja que ffmpeg repita la imagen de
+    fondo y queme (o incruste) los subtítulos.
+
+    Con `chunk_segments`, el video se codifica en tramos de ese número de
+    segmentos, guardados en una caché por contenido, y el MP4 final se obtiene
+    concatenándolos sin recodificar. Al cambiar un segmento solo se vuelve a
+    codificar su tramo.
+
+    Con `static_frames`, cada pantalla distinta (fondo con el título o con un
+    subtítulo) se compone una sola vez con Pillow y el demuxer concat la
+    mantiene durante los fotogramas de su segmento, en lugar de dibujar los
+    subtítulos en cada fotograma.
+    """
+
+    def __init__(self, video_config: Dict, subtitle_renderer: Optional[SubtitleRenderer] = None):
+        self.config = video_config
+        self.resolution = tuple(self.config.get('resolution', [1920, 1080]))
+        self.fps = self.config.get('fps', 24)
+        self.font = self.config.get('font', 'Arial')
+        self.fontsize = self.config.get('fontsize', 48)
+        self.font_color = self.config.get('font_color', 'white')
+        # Redondeada a fotogramas enteros para que los tramos empiecen en un borde de fotograma.
+        self.title_duration = round(self.config.get('title_duration_s', 5) * self.fps) / self.fps
+        self.ffmpeg_binary = self.config.get('ffmpeg_binary', 'ffmpeg')
+        # 'burn' dibuja los subtítulos en la imagen; 'mux' los añade como pista aparte.
+        self.subtitle_mode = self.config.get('subtitle_mode', 'burn')
+        # Segmentos por tramo de video; 0 codifica todo el video de una vez.
+        self.chunk_segments = self.config.get('chunk_segments', 40)
+        # Tramos codificados a la vez (cada uno en su propio proceso de ffmpeg); 0 = uno por núcleo.
+        self.encode_workers = self.config.get('encode_workers', 0) or os.cpu_count() or 1
+        # Compone cada pantalla una sola vez en vez de quemar los subtítulos fotograma a fotograma.
+        self.static_frames = self.config.get('static_frames', True)
+        self.subtitle_renderer = subtitle_renderer or SubtitleRenderer(
+            self.font, self.font_color, max_entries=self.config.get('subtitle_cache_size', 512)
+        )
+
+    def _chunk_cache(self) -> Optional[VideoChunkCache]:
+        """Caché de tramos, abierta al renderizar el primer video por tramos (None si está desactivada)."""
+        if not self.chunk_segments or not self.config.get('chunk_cache_enabled', True):
+            return None
+        path = os.path.abspath(self.config.get('chunk_cache_path', 'data/cache/video_chunks/'))
+        with _chunk_caches_lock:
+            if path not in _chunk_caches:
+                _chunk_caches[path] = VideoChunkCache(
+                    path, max_bytes=self.config.get('chunk_cache_max_bytes', 10 * 1024 ** 3)
+                )
+            return _chunk_caches[path]
+
+    def render(self, story: Story, bg_image_path: str, output_video_path: str,
+               narration_path: str, timings: List[Tuple[int, float, float]]) -> float:
+        """Renderiza el video y devuelve su duración en segundos."""
+        if not timings:
+            raise VideoError("No se pudo crear ningún segmento de video.")
+        if self.chunk_segments or self.static_frames:
+            return self._render_chunked(story, bg_image_path, output_video_path, narration_path, timings)
+
+        with tempfile.TemporaryDirectory(prefix="narrador_ffmpeg_") as work_dir:
+            audio_list_path = self._write_audio_list(narration_path, work_dir)
+            subtitles_path = os.path.join(work_dir, "subtitles.ass")
+            self._write_ass(self._subtitle_events(story, timings), subtitles_path)
+            total_duration = self.title_duration + wav_duration(narration_path)
+
+            command = self._build_command(bg_image_path, audio_list_path, subtitles_path, total_duration, output_video_path)
+            logger.info(f"Exportando video final con ffmpeg a: {output_video_path}")
+            with tracer.span("ffmpeg", segments=len(timings)) as span:
+                span.items, span.unit = total_duration * self.fps, "frames"
+                self._run(command, work_dir)
+        logger.info("Video exportado con éxito.")
+        return total_duration
+
+    def _render_chunked(self, story: Story, bg_image_path: str, output_video_path: str,
+                        narration_path: str, timings: List[Tuple[int, float, float]]) -> float:
+        total_duration = self.title_duration + wav_duration(narration_path)
+        chunks = self._plan_chunks(story, timings, round(total_duration * self.fps))
+        signature = self._encoding_signature(bg_image_path)
+        background = self._load_background(bg_image_path) if self.static_frames else None
+        chunk_cache = self._chunk_cache()
+
+        with tempfile.TemporaryDirectory(prefix="narrador_ffmpeg_") as work_dir:
+            # Todos los tramos de la lista de concatenación están en work_dir (los de la
+            # caché, enlazados): una expulsión de la caché no los puede borrar.
+            chunk_paths = [os.path.join(work_dir, f"chunk_{i:05d}.mp4") for i in range(len(chunks))]
+            pending = []
+            for i, (n_frames, events) in enumerate(chunks):
+                if self.subtitle_mode != 'burn':
+                    events = []
+                content = repr(events) if self.static_frames else self._ass_document(self._frames_to_seconds(events))
+                key = VideoChunkCache.make_key(signature, str(n_frames), content if events else "")
+                if not (chunk_cache and chunk_cache.fetch(key, chunk_paths[i])):
+                    if self.static_frames:
+                        # Pillow no se reparte entre hilos: las pantallas se componen aquí, antes de codificar.
+                        frames_dir = os.path.join(work_dir, f"frames_{i:05d}")
+                        os.makedirs(frames_dir)
+                        with tracer.span("compose_frames", chunk=i) as span:
+                            content = self._write_static_frames(background, events, n_frames, frames_dir)
+                            span.items, span.unit = len(events), "events"
+                    elif not events:
+                        content = ""
+                    pending.append((i, key, n_frames, content))
+
+            workers = max(1, min(self.encode_workers, len(pending)))
+            # Los núcleos se reparten entre los procesos de ffmpeg que trabajan a la vez.
+            threads = max(1, (os.cpu_count() or 1) // workers)
+
+            def encode(job: Tuple[int, str, int, str]):
+                i, key, n_frames, source = job
+                path = chunk_paths[i]
+                with tracer.span("chunk_encode", chunk=i) as span:
+                    span.items, span.unit = n_frames, "frames"
+                    if self.static_frames:
+                        self._encode_static_chunk(source, n_frames, path, work_dir, threads)
+                    else:
+                        self._encode_chunk(bg_image_path, source, n_frames, path, work_dir, threads)
+                if chunk_cache:
+                    chunk_cache.store(key, path)
+
+            if pending:
+                logger.info(f"Codificando {len(pending)} tramos de video con {workers} procesos de ffmpeg.")
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk-encode") as executor:
+                    list(executor.map(tracer.bind(encode), pending))
+            logger.info(f"Tramos de video: {len(pending)} codificados, {len(chunks) - len(pending)} reutilizados de la caché.")
+
+            video_list_path = os.path.join(work_dir, "video.txt")
+            with open(video_list_path, 'w', encoding='utf-8') as f:
+                f.writelines(concat_list_line(path) for path in chunk_paths)
+            audio_list_path = self._write_audio_list(narration_path, work_dir)
+            subtitles_path = None
+            if self.subtitle_mode == 'mux':
+                subtitles_path = os.path.join(work_dir, "subtitles.ass")
+                self._write_ass(self._subtitle_events(story, timings), subtitles_path)
+
+            command = self._build_concat_command(video_list_path, audio_list_path, subtitles_path,
+                                                 total_duration, output_video_path)
+            logger.info(f"Uniendo {len(chunk_paths)} tramos en: {output_video_path}")
+            with tracer.span("ffmpeg_concat", chunks=len(chunk_paths)) as span:
+                span.items, span.unit = total_duration * self.fps, "frames"
+                self._run(command, work_dir)
+        logger.info("Video exportado con éxito.")
+        return total_duration
+
+    def _plan_chunks(self, story: Story, timings: List[Tuple[int, float, float]],
+                     total_frames: int) -> List[Tuple[int, List[SubtitleEvent]]]:
+        """
+        Divide el video en tramos de `chunk_segments` segmentos (uno solo si es
+        0), con límites en bordes de fotograma. Devuelve (fotogramas, eventos) por tramo; los
+        eventos van en fotogramas relativos al inicio del tramo, y el título
+        pertenece al primero.
+        """
+        title_frames = round(self.title_duration * self.fps)
+        events = [("Title", 0, title_frames, self._title_text(story))]
+        for index, start, end in timings:
+            start_frame = round((self.title_duration + start) * self.fps)
+            # La duración se redondea aparte: no depende de dónde empiece el segmento.
+            end_frame = start_frame + max(1, round((end - start) * self.fps))
+            events.append(("Default", start_frame, end_frame, story.script[index].text))
+
+        step = self.chunk_segments or len(events)
+        boundaries = [0]
+        for position in range(1 + step, len(events), step):
+            if boundaries[-1] < events[position][1] < total_frames:
+                boundaries.append(events[position][1])
+        boundaries.append(total_frames)
+
+        chunks = []
+        for chunk_start, chunk_end in zip(boundaries, boundaries[1:]):
+            chunk_events = [
+                (style, max(start, chunk_start) - chunk_start, min(end, chunk_end) - chunk_start, text)
+                for style, start, end, text in events
+                if start < chunk_end and end > chunk_start
+            ]
+            chunks.append((chunk_end - chunk_start, chunk_events))
+        return chunks
+
+    def _frames_to_seconds(self, events: List[SubtitleEvent]) -> List[SubtitleEvent]:
+        return [(style, start / self.fps, end / self.fps, text) for style, start, end, text in events]
+
+    def _encoding_signature(self, bg_image_path: str) -> str:
+        """Todo lo que, además de los subtítulos, determina las imágenes de un tramo."""
+        width, height = self.resolution
+        return "|".join([
+            "v1", f"{width}x{height}", str(self.fps), self.subtitle_mode,
+            "static" if self.static_frames else "filter", f"{self.font}:{self.fontsize}:{self.font_color}",
+            " ".join(self._video_codec_args()), file_digest(bg_image_path),
+        ])
+
+    def quality_args(self) -> List[str]:
+        """CRF y ajuste de x264 del perfil de render (el preset va aparte: moviepy lo recibe como argumento)."""
+        args = ['-crf', str(self.config.get('crf', 23))]
+        tune = self.config.get('tune')
+        if tune:
+            args += ['-tune', tune]
+        return args
+
+    def _video_codec_args(self) -> List[str]:
+        return ['-c:v', 'libx264', '-preset', self.config.get('preset', 'medium'), *self.quality_args(),
+                '-r', str(self.fps)]
+
+    def _video_filter(self, subtitles_path: Optional[str]) -> str:
+        width, height = self.resolution
+        video_filter = f"scale={width}:{height},format=yuv420p"
+        if subtitles_path:
+            # ffmpeg se ejecuta en el directorio de trabajo para evitar escapar la ruta.
+            video_filter += f",subtitles={os.path.basename(subtitles_path)}"
+        return video_filter
+
+    def _encode_chunk(self, bg_image_path: str, ass_text: str, n_frames: int, output_path: str, work_dir: str,
+                      threads: int = 0):
+        subtitles_path = None
+        if ass_text:
+            subtitles_path = f"{os.path.splitext(output_path)[0]}.ass"
+            with open(subtitles_path, 'w', encoding='utf-8') as f:
+                f.write(ass_text)
+        command = [
+            self.ffmpeg_binary, '-y', '-hide_banner', '-loglevel', 'error',
+            '-loop', '1', '-framerate', str(self.fps), '-i', os.path.abspath(bg_image_path),
+            '-filter_complex', f"[0:v]{self._video_filter(subtitles_path)}[v]",
+            '-map', '[v]', '-frames:v', str(n_frames),
+            *self._video_codec_args(),
+            '-threads', str(threads),
+            '-an', os.path.abspath(output_path),
+        ]
+        self._run(command, work_dir)
+
+    def _load_background(self, bg_image_path: str) -> Image.Image:
+        with Image.open(bg_image_path) as img:
+            return img.convert('RGB').resize(self.resolution, Image.LANCZOS)
+
+    def _compose_screen(self, background: Image.Image, style: Optional[str], text: str) -> Image.Image:
+        """Fondo con el título centrado o con el subtítulo abajo, como en el motor moviepy."""
+        frame = background.copy()
+        width, height = self.resolution
+        text_width = int(width * 0.8)
+        if style == "Title":
+            title, author = text.rsplit('\n', 1)
+            title_image = Image.fromarray(self.subtitle_renderer.render(title, int(self.fontsize * 1.5), text_width))
+            author_image = Image.fromarray(self.subtitle_renderer.render(author, int(self.fontsize * 0.8), text_width))
+            y = (height - title_image.height - author_image.height) // 2
+            frame.paste(title_image, ((width - title_image.width) // 2, y), title_image)
+            frame.paste(author_image, ((width - author_image.width) // 2, y + title_image.height), author_image)
+        elif style:
+            subtitle_image = Image.fromarray(self.subtitle_renderer.render(text, self.fontsize, text_width))
+            frame.paste(subtitle_image, ((width - subtitle_image.width) // 2, height - subtitle_image.height),
+                        subtitle_image)
+        return frame
+
+    def _write_static_frames(self, background: Image.Image, events: List[SubtitleEvent], n_frames: int,
+                             frames_dir: str) -> str:
+        """
+        Guarda cada pantalla distinta del tramo una sola vez y escribe la lista
+        del demuxer concat que la mantiene el número de fotogramas de su evento.
+        Devuelve la ruta de la lista.
+        """
+        screens: Dict[Tuple[Optional[str], str], str] = {}
+        lines = ["ffconcat version 1.0\n"]
+        last_path = ""
+
+        def hold(style: Optional[str], text: str, frames: int):
+            nonlocal last_path
+            if frames <= 0:
+                return
+            path = screens.get((style, text))
+            if path is None:
+                path = os.path.join(frames_dir, f"{len(screens):05d}.png")
+                # Sin compresión: el PNG solo vive hasta que ffmpeg lo lee.
+                self._compose_screen(background, style, text).save(path, compress_level=0)
+                screens[(style, text)] = path
+            lines.append(concat_list_line(path))
+            lines.append(f"duration {frames / self.fps:.6f}\n")
+            last_path = path
+
+        cursor = 0
+        for style, start, end, text in sorted(events, key=lambda event: event[1]):
+            start = max(start, cursor)
+            hold(None, "", start - cursor)
+            hold(style, text, end - start)
+            cursor = max(cursor, end)
+        hold(None, "", n_frames - cursor)
+        # El demuxer concat ignora la duración de la última entrada si no se repite.
+        lines.append(concat_list_line(last_path))
+
+        list_path = os.path.join(frames_dir, "frames.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+        return list_path
+
+    def _encode_static_chunk(self, frames_list_path: str, n_frames: int, output_path: str, work_dir: str,
+                             threads: int = 0):
+        """Codifica a fps constante: ffmpeg repite cada pantalla sin volver a componerla."""
+        command = [
+            self.ffmpeg_binary, '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', frames_list_path,
+            '-vf', self._video_filter(None),
+            '-frames:v', str(n_frames),
+            *self._video_codec_args(),
+            *self._cfr_args(),
+            '-threads', str(threads),
+            '-an', os.path.abspath(output_path),
+        ]
+        self._run(command, work_dir)
+
+    def _cfr_args(self) -> List[str]:
+        """
+        Salida a fps constante. '-fps_mode' existe desde ffmpeg 5.1; las versiones
+        anteriores (como la 4.4 de Ubuntu 22.04) solo aceptan '-vsync'.
+        """
+        version = self._ffmpeg_version()
+        if version is not None and version < (5, 1):
+            return ['-vsync', 'cfr']
+        return ['-fps_mode', 'cfr']
+
+    def _ffmpeg_version(self) -> Optional[Tuple[int, int]]:
+        """Versión del binario de ffmpeg, leída una vez; None si no se reconoce (p. ej. compilaciones de git)."""
+        if self.ffmpeg_binary not in _ffmpeg_versions:
+            version = None
+            try:
+                output = subprocess.run([self.ffmpeg_binary, '-version'], capture_output=True,
+                                        text=True, timeout=30).stdout
+                match = FFMPEG_VERSION_RE.search(output)
+                if match:
+                    version = (int(match.group(1)), int(match.group(2)))
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.warning(f"No se pudo leer la versión de ffmpeg ({self.ffmpeg_binary}): {e}")
+            logger.info(f"Versión de ffmpeg: {'.'.join(map(str, version)) if version else 'desconocida'}")
+            _ffmpeg_versions[self.ffmpeg_binary] = version
+        return _ffmpeg_versions[self.ffmpeg_binary]
+
+    def _build_concat_command(self, video_list_path: str, audio_list_path: str, subtitles_path: Optional[str],
+                              total_duration: float, output_video_path: str) -> List[str]:
+        command = [
+            self.ffmpeg_binary, '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', video_list_path,
+            '-f', 'concat', '-safe', '0', '-i', audio_list_path,
+        ]
+        if subtitles_path:
+            command += ['-i', subtitles_path]
+        command += ['-map', '0:v', '-map', '1:a']
+        if subtitles_path:
+            command += ['-map', '2:s', '-c:s', 'mov_text']
+        command += [
+            '-c:v', 'copy',
+            '-c:a', 'aac',
+            '-t', f"{total_duration:.3f}",
+            '-movflags', '+faststart',
+            os.path.abspath(output_video_path),
+        ]
+        return command
+
+    def _write_audio_list(self, narration_path: str, work_dir: str) -> str:
+        """Escribe la lista del demuxer concat: silencio del título seguido de la narración."""
+        silence_path = os.path.join(work_dir, "title_silence.wav")
+        with wave.open(narration_path, 'rb') as reference:
+            params = reference.getparams()
+        with wave.open(silence_path, 'wb') as silence:
+            silence.setnchannels(params.nchannels)
+            silence.setsampwidth(params.sampwidth)
+            silence.setframerate(params.framerate)
+            n_frames = int(round(self.title_duration * params.framerate))
+            silence.writeframes(b'\x00' * n_frames * params.nchannels * params.sampwidth)
+
+        list_path = os.path.join(work_dir, "audio.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.write(concat_list_line(silence_path))
+            f.write(concat_list_line(narration_path))
+        return list_path
+
+    def _title_text(self, story: Story) -> str:
+        return f"{story.title}\npor {story.author}"
+
+    def _ass_text(self, style: str, text: str) -> str:
+        if style == "Title":
+            title, author = text.rsplit('\n', 1)
+            return f"{escape_ass_text(title)}\\N{{\\fs{int(self.fontsize * 0.8)}}}{escape_ass_text(author)}"
+        return escape_ass_text(text)
+
+    def _subtitle_events(self, story: Story, timings: List[Tuple[int, float, float]]) -> List[SubtitleEvent]:
+        """Eventos de todo el video en segundos; los tiempos de la narración se desplazan tras el título."""
+        events = [("Title", 0.0, self.title_duration, self._title_text(story))]
+        for index, start, end in timings:
+            events.append(("Default", self.title_duration + start, self.title_duration + end,
+                           story.script[index].text))
+        return events
+
+    def _ass_document(self, events: List[SubtitleEvent]) -> str:
+        width, height = self.resolution
+        margin = int(width * 0.1)
+        color = ass_color(self.font_color)
+        lines = [
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            f"PlayResX: {width}",
+            f"PlayResY: {height}",
+            "WrapStyle: 0",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, OutlineColour, BackColour, Bold, Italic, "
+            "BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+            f"Style: Default,{self.font},{self.fontsize},{color},&H00000000,&H80000000,0,0,1,2,0,2,{margin},{margin},40,1",
+            f"Style: Title,{self.font},{int(self.fontsize * 1.5)},{color},&H00000000,&H80000000,0,0,1,2,0,5,{margin},{margin},0,1",
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+        ]
+        for style, start, end, text in events:
+            lines.append(f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},{style},,0,0,0,,"
+                         f"{self._ass_text(style, text)}")
+        return "\n".join(lines) + "\n"
+
+    def _write_ass(self, events: List[SubtitleEvent], path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self._ass_document(events))
+
+    def _build_command(self, bg_image_path: str, audio_list_path: str, subtitles_path: str,
+                       total_duration: float, output_video_path: str) -> List[str]:
+        command = [
+            self.ffmpeg_binary, '-y', '-hide_banner', '-loglevel', 'error',
+            '-loop', '1', '-framerate', str(self.fps), '-i', os.path.abspath(bg_image_path),
+            '-f', 'concat', '-safe', '0', '-i', audio_list_path,
+        ]
+        if self.subtitle_mode == 'mux':
+            command += ['-i', subtitles_path]
+        burned = subtitles_path if self.subtitle_mode == 'burn' else None
+        command += [
+            '-filter_complex', f"[0:v]{self._video_filter(burned)}[v]",
+            '-map', '[v]', '-map', '1:a',
+        ]
+        if self.subtitle_mode == 'mux':
+            command += ['-map', '2:s', '-c:s', 'mov_text']
+        command += [
+            *self._video_codec_args(),
+            '-c:a', 'aac',
+            '-t', f"{total_duration:.3f}",
+            '-movflags', '+faststart',
+            os.path.abspath(output_video_path),
+        ]
+        return command
+
+    def render_audio(self, story: Story, narration_path: str, output_path: str) -> float:
+        """Exporta solo la narración (perfiles sin video) y devuelve su duración en segundos."""
+        audio_format = self.config.get('audio_format', 'm4a')
+        if audio_format not in AUDIO_CODECS:
+            raise VideoError(f"Formato de audio no soportado: '{audio_format}'. Disponibles: {', '.join(AUDIO_CODECS)}")
+        output_path = os.path.abspath(output_path)
+        command = [
+            self.ffmpeg_binary, '-y', '-hide_banner', '-loglevel', 'error',
+            '-i', os.path.abspath(narration_path), '-vn',
+            *AUDIO_CODECS[audio_format],
+            '-b:a', str(self.config.get('audio_bitrate', '96k')),
+            '-metadata', f"title={story.title}", '-metadata', f"artist={story.author}",
+            output_path,
+        ]
+        logger.info(f"Exportando solo audio ({audio_format}) a: {output_path}")
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        duration = wav_duration(narration_path)
+        with tracer.span("ffmpeg_audio") as span:
+            span.items, span.unit = duration, "audio_s"
+            self._run(command, os.path.dirname(output_path))
+        logger.info("Audio exportado con éxito.")
+        return duration
+
+    def _run(self, command: List[str], work_dir: str):
+        logger.debug(f"Ejecutando: {' '.join(command)}")
+        try:
+            run_subprocess(command, cwd=work_dir)
+        except FileNotFoundError as e:
+            raise VideoError(f"No se encontró el ejecutable de ffmpeg: {self.ffmpeg_binary}") from e
+        except subprocess.CalledProcessError as e:
+            logger.error(f"ffmpeg terminó con error: {e.stderr[-2000:]}")
+            raise VideoError("No se pudo escribir el archivo de video final.") from e
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class HttpCache:
+    """
+    Caché en disco de respuestas HTTP con revalidación condicional.
+
+    Cada URL se guarda como <hash>.body (contenido) y <hash>.json (ETag,
+    Last-Modified, codificación y fecha). Al volver a pedir la URL se envían
+    If-None-Match / If-Modified-Since; si el servidor responde 304 se usa la
+    copia local sin volver a descargarla.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return f"{base}.json", f"{base}.body"
+
+    def get(self, url: str) -> Optional[Tuple[Dict, bytes]]:
+        """Devuelve (metadatos, contenido) de la copia guardada, o None."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """Cabeceras para una petición condicional sobre la copia guardada."""
+        cached = self.get(url)
+        if cached is None:
+            return {}
+        meta, _ = cached
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def store(self, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str], encoding: Optional[str]):
+        meta_path, body_path = self._paths(url)
+        meta = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'encoding': encoding,
+            'fetched_at': time.time(),
+        }
+        with self._lock:
+            self.misses += 1
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            self._write_atomic(body_path, body)
+            self._write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+
+    def mark_revalidated(self, url: str):
+        """Registra un 304: la copia sigue siendo válida."""
+        with self._lock:
+            self.hits += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def _write_atomic(path: str, content: bytes):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
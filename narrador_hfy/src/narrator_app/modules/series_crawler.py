@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from ..data_structures import Story
+from ..profiling import tracer
+from ..utils import StoryProcessingError
+from .story_processor import StoryProcessor
+
+logger = logging.getLogger(__name__)
+
+REDDIT_HOSTS = ('reddit.com', 'www.reddit.com', 'old.reddit.com', 'new.reddit.com', 'np.reddit.com')
+POST_ID_RE = re.compile(r'/r/HFY/comments/([a-z0-9]+)', re.IGNORECASE)
+# Texto de los enlaces de navegación habituales en las series de r/HFY.
+NEXT_RE = re.compile(r'\bnext\b|>>|→', re.IGNORECASE)
+CHAPTER_RE = re.compile(
+    r'\b(prev(ious)?|last|first|next)\b|<<|>>|←|→|\b(part|chapter|ch\.?|episode|ep\.?|book)\s*\d+',
+    re.IGNORECASE,
+)
+
+class SeriesCrawler:
+    """
+    Descarga todos los capítulos de una serie a partir de uno de sus posts.
+
+    Si los capítulos enlazan un índice de la wiki del subreddit, la sección del
+    índice que incluye el post de partida da de una vez la lista y el orden de
+    los capítulos, que se piden todos a la vez. Las demás secciones se ignoran,
+    porque las páginas de autor enlazan todas sus series. Los enlaces de
+    navegación de cada capítulo (primero, anterior, siguiente, "Part N"...)
+    completan los capítulos que falten en el índice y sirven para ordenarlos
+    cuando no hay índice.
+
+    Cada capítulo se pide en cuanto se descubre, sin esperar al resto de su
+    tanda. Las peticiones van con asyncio, con un máximo de peticiones
+    simultáneas y por segundo, y usan la sesión y la caché HTTP de
+    StoryProcessor.
+    """
+
+    def __init__(self, config: Dict, story_processor: Optional[StoryProcessor] = None):
+        self.config = config
+        series_config = config.get('series', {})
+        self.max_chapters = series_config.get('max_chapters', 100)
+        self.max_concurrency = series_config.get('max_concurrency', 8)
+        self.requests_per_second = series_config.get('requests_per_second', 4)
+        self.follow_wiki = series_config.get('follow_wiki', True)
+        self.story_processor = story_processor or StoryProcessor(config)
+
+    def crawl(self, url: str) -> List[Story]:
+        """Devuelve los capítulos de la serie de `url`, ordenados del primero al último."""
+        with tracer.span("series_crawl", url=url) as span:
+            stories = asyncio.run(self._crawl(url))
+            span.items, span.unit = len(stories), "capítulos"
+        logger.info(f"Serie descargada: {len(stories)} capítulos.")
+        return stories
+
+    def crawl_combined(self, url: str) -> Story:
+        """Como crawl(), pero une todos los capítulos en una sola historia."""
+        return self.combine(self.crawl(url))
+
+    @staticmethod
+    def combine(stories: List[Story]) -> Story:
+        """Une los capítulos en una historia; el título de cada capítulo queda como un párrafo más."""
+        if not stories:
+            raise StoryProcessingError("La serie no tiene capítulos.")
+        text = "\n\n".join(f"{story.title}\n\n{story.original_text}" for story in stories)
+        first = stories[0]
+        return Story(url=first.url, title=first.title, author=first.author, original_text=text)
+
+    async def _crawl(self, url: str) -> List[Story]:
+        start_id = self._post_id(url)
+        if start_id is None:
+            raise ValueError(f"La URL proporcionada no es un post de r/HFY: {url}")
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._rate_lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+        posts: Dict[str, Tuple[Story, List[Tuple[str, str]], Optional[float]]] = {}
+        next_links: Dict[str, str] = {}
+        index: List[str] = []
+        seen_posts = set()
+        seen_wikis = set()
+        tasks: Dict[asyncio.Task, Tuple[str, str]] = {}
+
+        def schedule(kind: str, target: str):
+            tasks[asyncio.ensure_future(self._fetch(kind, target))] = (kind, target)
+
+        def add_post(href: str):
+            post_id = self._post_id(href)
+            if post_id and post_id not in seen_posts and len(seen_posts) < self.max_chapters:
+                seen_posts.add(post_id)
+                schedule("post", self._normalize(href))
+
+        add_post(url)
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                kind, target = tasks.pop(task)
+                error = task.exception()
+                if error is not None:
+                    if kind == "post" and self._post_id(target) == start_id:
+                        for other in tasks:
+                            other.cancel()
+                        raise error
+                    logger.warning(f"No se pudo descargar {target}: {error}")
+                    continue
+
+                if kind == "wiki":
+                    section = self._series_section(task.result(), start_id)
+                    if section and not index:
+                        index = list(section)
+                        logger.info(f"Índice de la wiki con {len(section)} capítulos: {target}")
+                        for href in section.values():
+                            add_post(href)
+                    continue
+
+                post_id = self._post_id(target)
+                posts[post_id] = task.result()
+                for text, href in self._chapter_links(posts[post_id][1], post_id, next_links):
+                    if self._post_id(href):
+                        add_post(href)
+                    elif self.follow_wiki and not index and href not in seen_wikis:
+                        seen_wikis.add(href)
+                        schedule("wiki", href)
+
+        return self._order(posts, next_links, index)
+
+    def _series_section(self, sections: List[List[Tuple[str, str]]], start_id: str) -> Dict[str, str]:
+        """
+        Capítulos (id -> URL, en orden) de la sección del índice que incluye el
+        post de partida; vacío si ninguna sección lo incluye.
+        """
+        for section in sections:
+            chapters: Dict[str, str] = {}
+            for _, href in section:
+                href = urljoin("https://www.reddit.com", href)
+                post_id = self._post_id(href)
+                if post_id:
+                    chapters.setdefault(post_id, href)
+            if start_id in chapters and len(chapters) > 1:
+                return chapters
+        return {}
+
+    def _chapter_links(self, links: List[Tuple[str, str]], post_id: str,
+                       next_links: Dict[str, str]) -> List[Tuple[str, str]]:
+        """Enlaces de navegación de un capítulo (a otros capítulos o a la wiki)."""
+        candidates = []
+        for text, href in links:
+            href = urljoin("https://www.reddit.com", href)
+            target_id = self._post_id(href)
+            if target_id and CHAPTER_RE.search(text):
+                candidates.append((text, href))
+                if NEXT_RE.search(text):
+                    next_links.setdefault(post_id, target_id)
+            elif not target_id and self._is_wiki_url(href):
+                candidates.append((text, href))
+        return candidates
+
+    async def _fetch(self, kind: str, url: str):
+        async with self._semaphore:
+            await self._throttle()
+            if kind == "post":
+                return await asyncio.to_thread(self.story_processor.fetch_post, url)
+            return await asyncio.to_thread(self.story_processor.fetch_wiki_sections, url)
+
+    async def _throttle(self):
+        """Espacia el inicio de las peticiones según requests_per_second."""
+        if not self.requests_per_second:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._rate_lock:
+            now = loop.time()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + 1.0 / self.requests_per_second
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    def _order(posts: Dict[str, Tuple[Story, List, Optional[float]]], next_links: Dict[str, str],
+               index: List[str]) -> List[Story]:
+        """
+        Ordena los capítulos: por el índice de la wiki si los incluye a todos; si
+        no, siguiendo los enlaces "siguiente" desde el capítulo al que ningún otro
+        apunta, y por la fecha de publicación si esa cadena no los cubre todos.
+        """
+        if index and set(posts) <= set(index):
+            order = [post_id for post_id in index if post_id in posts]
+        else:
+            targets = set(next_links.values())
+            order = []
+            for head in [post_id for post_id in posts if post_id not in targets] or list(posts)[:1]:
+                post_id = head
+                while post_id in posts and post_id not in order:
+                    order.append(post_id)
+                    post_id = next_links.get(post_id)
+            chain_complete = len(order) == len(posts) and len(posts) - len(targets & set(posts)) <= 1
+            if not chain_complete and all(created is not None for _, _, created in posts.values()):
+                order = sorted(posts, key=lambda post_id: posts[post_id][2])
+        # Capítulos que el índice o la cadena no cubren, al final en orden de descubrimiento.
+        order += [post_id for post_id in posts if post_id not in order]
+        return [posts[post_id][0] for post_id in order]
+
+    @staticmethod
+    def _post_id(url: str) -> Optional[str]:
+        parsed = urlparse(url)
+        if parsed.hostname and parsed.hostname not in REDDIT_HOSTS:
+            return None
+        match = POST_ID_RE.search(parsed.path)
+        return match.group(1).lower() if match else None
+
+    @staticmethod
+    def _normalize(url: str) -> str:
+        """URL canónica del post en www.reddit.com (la que acepta StoryProcessor)."""
+        path = urlparse(urljoin("https://www.reddit.com", url)).path
+        return f"https://www.reddit.com{path}"
+
+    @staticmethod
+    def _is_wiki_url(url: str) -> bool:
+        parsed = urlparse(url)
+        return parsed.hostname in REDDIT_HOSTS and '/r/HFY/wiki/' in parsed.path
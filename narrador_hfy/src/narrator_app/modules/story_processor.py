@@ -1,16 +1,27 @@
+import json
 import logging
 import requests
 from bs4 import BeautifulSoup
-from typing import Dict
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse
+from urllib3.util.retry import Retry
 
 # Asumimos que estas importaciones vienen de nuestros otros módulos
 from ..data_structures import Story
+from ..profiling import tracer
 from ..utils import StoryProcessingError, NetworkError
+from .http_cache import HttpCache
 
 # Configurar un logger específico para este módulo
 logger = logging.getLogger(__name__)
 
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
 class StoryProcessor:
     """
     Clase para adquirir, parsear y limpiar historias desde URLs de Reddit.
@@ -24,12 +35,38 @@ class StoryProcessor:
             config (Dict): Un diccionario de configuración.
         """
         self.config = config
-        self.session = requests.Session()
+        self.fetch_config = config.get('story_processing', {})
+        # 'json' usa el endpoint .json del post; 'html' descarga y recorre la página completa.
+        self.fetch_mode = self.fetch_config.get('fetch_mode', 'json')
+        self.timeout = self.fetch_config.get('timeout_s', 10)
+        # Permite apuntar las peticiones a otro servidor (p. ej. uno local con datos de prueba).
+        self.base_url = self.fetch_config.get('base_url', 'https://www.reddit.com').rstrip('/')
+        self.session = self._create_session()
+
+        self.http_cache: Optional[HttpCache] = None
+        if self.fetch_config.get('http_cache_enabled', True):
+            self.http_cache = HttpCache(self.fetch_config.get('http_cache_path', 'data/cache/http'))
+        logger.info(f"StoryProcessor inicializado (modo: {self.fetch_mode}).")
+
+    def _create_session(self) -> requests.Session:
+        """Sesión con conexiones reutilizables y reintentos con espera exponencial."""
+        session = requests.Session()
         # Es buena práctica usar un User-Agent para no ser bloqueado
-        self.session.headers.update({
-            "User-Agent": "NarratorApp/1.0 (compatible; +http://localhost)"
+        session.headers.update({
+            "User-Agent": self.fetch_config.get('user_agent', "NarratorApp/1.0 (compatible; +http://localhost)")
         })
-        logger.info("StoryProcessor inicializado.")
+        retry = Retry(
+            total=self.fetch_config.get('max_retries', 3),
+            backoff_factor=self.fetch_config.get('backoff_factor', 0.5),
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+        )
+        pool_size = self.fetch_config.get('pool_size', 10)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
 
     def get_story_from_url(self, url: str) -> Story:
         """
@@ -46,30 +83,170 @@ class StoryProcessor:
             NetworkError: Si hay problemas de conexión.
             StoryProcessingError: Si no se puede parsear la historia.
         """
+        story, _, _ = self.fetch_post(url)
+        return story
+
+    def fetch_post(self, url: str) -> Tuple[Story, List[Tuple[str, str]], Optional[float]]:
+        """
+        Como get_story_from_url, pero devuelve también los enlaces del cuerpo del
+        post como (texto, href) y su fecha de publicación (solo en modo 'json').
+        Lo usa SeriesCrawler para encontrar los demás capítulos de una serie.
+        """
         if not self._is_valid_reddit_url(url):
             raise ValueError(f"La URL proporcionada no es una URL de Reddit válida: {url}")
 
-        html = self._fetch_html(url)
-        story = self._parse_story(html, url)
-        
-        return story
+        created_utc = None
+        with tracer.span("fetched", "stage", url=url, mode=self.fetch_mode) as span:
+            if self.fetch_mode == 'json':
+                with tracer.span("http_get"):
+                    data = self._fetch_json(url)
+                with tracer.span("parse_json"):
+                    story = self._parse_story_json(data, url)
+                    post = self._post_data(data)
+                    links = self._extract_links(post.get('selftext_html') or "")
+                    created_utc = post.get('created_utc')
+            else:
+                with tracer.span("http_get"):
+                    html = self._fetch_html(url)
+                with tracer.span("parse_html"):
+                    # Un solo análisis del HTML para la historia y para sus enlaces.
+                    soup = BeautifulSoup(html, HTML_PARSER)
+                    story = self._parse_story(html, url, soup)
+                    post_content_div = soup.find('div', {'data-click-id': 'text'})
+                    links = self._element_links(post_content_div) if post_content_div else []
+            span.items, span.unit = len(story.original_text.split()), "palabras"
 
-    def _fetch_html(self, url: str) -> str:
-        """Obtiene el contenido HTML de una URL."""
+        return story, links, created_utc
+
+    def fetch_wiki_sections(self, url: str) -> List[List[Tuple[str, str]]]:
+        """
+        Enlaces (texto, href) de una página de la wiki del subreddit, en orden y
+        agrupados por secciones: cada encabezado o línea horizontal abre una nueva.
+        """
+        if self.fetch_mode == 'json':
+            text = self._get(self._request_url(url, ".json?raw_json=1"))
+            try:
+                body_html = json.loads(text)['data']['content_html'] or ""
+            except (ValueError, KeyError, TypeError) as e:
+                raise StoryProcessingError(f"La página de la wiki {url} no tiene el formato esperado.") from e
+        else:
+            body_html = self._fetch_html(url)
+        sections: List[List[Tuple[str, str]]] = [[]]
+        for element in BeautifulSoup(body_html, HTML_PARSER).find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'a']):
+            if element.name != 'a':
+                sections.append([])
+            elif element.get('href'):
+                sections[-1].append((element.get_text(strip=True), element['href']))
+        return [section for section in sections if section]
+
+    @classmethod
+    def _extract_links(cls, body_html: str) -> List[Tuple[str, str]]:
+        return cls._element_links(BeautifulSoup(body_html, HTML_PARSER))
+
+    @staticmethod
+    def _element_links(element) -> List[Tuple[str, str]]:
+        """Enlaces (texto, href) dentro de un elemento ya analizado, en orden."""
+        return [(a.get_text(strip=True), a['href']) for a in element.find_all('a', href=True)]
+
+    def _request_url(self, url: str, suffix: str = "") -> str:
+        """URL a pedir: la ruta del post sobre `base_url`, con el sufijo indicado."""
+        path = urlparse(url).path.rstrip('/')
+        return f"{self.base_url}{path}{suffix}"
+
+    def _get(self, url: str) -> str:
+        """
+        GET con la caché HTTP: si hay copia local se hace una petición condicional
+        y un 304 devuelve la copia sin descargar de nuevo. Si la red falla (error
+        de conexión, tiempo agotado, 429 o 5xx) y hay copia local, se usa esa
+        copia; un 4xx, como un post borrado, es un error aunque haya copia.
+        """
+        headers = self.http_cache.validators(url) if self.http_cache else {}
         try:
             logger.info(f"Obteniendo historia desde: {url}")
-            response = self.session.get(url, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and self.http_cache:
+                text = self._cached_text(url)
+                if text is not None:
+                    self.http_cache.mark_revalidated(url)
+                    logger.info("La historia no ha cambiado desde la última descarga; se usa la copia en caché.")
+                    return text
+                # La copia se borró después de leer sus validadores: se pide completa.
+                logger.info(f"La copia en caché de {url} ya no existe; se descarga de nuevo.")
+                response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()  # Lanza una excepción para códigos de error HTTP
-            return response.text
         except requests.exceptions.RequestException as e:
+            status = e.response.status_code if getattr(e, 'response', None) is not None else None
+            if status is not None and status < 500 and status != 429:
+                logger.error(f"La URL {url} respondió con el error HTTP {status}.")
+                raise NetworkError(f"No se pudo obtener {url} (HTTP {status}).") from e
+            text = self._cached_text(url)
+            if text is not None:
+                logger.warning(f"Error de red al obtener {url} ({e}); se usa la copia en caché.")
+                return text
             logger.error(f"Error de red al intentar obtener la URL {url}: {e}")
             raise NetworkError(f"No se pudo conectar a {url}.") from e
 
-    def _parse_story(self, html: str, url: str) -> Story:
-        """Parsea el HTML para extraer metadatos y el contenido principal de la historia."""
+        if self.http_cache:
+            self.http_cache.store(url, response.content, response.headers.get('ETag'),
+                                  response.headers.get('Last-Modified'), response.encoding)
+        return response.text
+
+    def _cached_text(self, url: str) -> Optional[str]:
+        """Cuerpo guardado en la caché HTTP para la URL, o None si no hay copia."""
+        cached = self.http_cache.get(url) if self.http_cache else None
+        if cached is None:
+            return None
+        meta, body = cached
+        return body.decode(meta.get('encoding') or 'utf-8')
+
+    def _fetch_html(self, url: str) -> str:
+        """Obtiene el contenido HTML de una URL."""
+        return self._get(self._request_url(url))
+
+    def _fetch_json(self, url: str):
+        """Obtiene los datos del post desde el endpoint .json (raw_json=1 evita el escapado HTML)."""
+        text = self._get(self._request_url(url, ".json?raw_json=1"))
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            raise StoryProcessingError("La respuesta de la API de Reddit no es JSON válido.") from e
+
+    @staticmethod
+    def _post_data(data) -> Dict:
+        """Datos del post dentro de la respuesta del endpoint .json."""
+        try:
+            return data[0]['data']['children'][0]['data']
+        except (KeyError, IndexError, TypeError) as e:
+            logger.error(f"El JSON no tiene la estructura esperada de un post: {e}")
+            raise StoryProcessingError("No se pudo encontrar el contenido del post en el JSON.") from e
+
+    def _parse_story_json(self, data, url: str) -> Story:
+        """Extrae título, autor y párrafos del JSON del post."""
+        logger.info("Parseando el JSON de la historia.")
+        post = self._post_data(data)
+        title = post.get('title') or "Título no encontrado"
+        author = post.get('author') or "Autor desconocido"
+        body_html = post.get('selftext_html') or ""
+
+        # Solo se analiza el cuerpo del post, no la página completa.
+        soup = BeautifulSoup(body_html, HTML_PARSER)
+        paragraphs = [p.get_text(strip=True) for p in soup.find_all('p')]
+        main_text = "\n\n".join(p for p in paragraphs if p)
+        if not main_text:
+            logger.warning("El texto principal de la historia está vacío.")
+
+        logger.info(f"Historia '{title}' parseada correctamente.")
+        return Story(url=url, title=title, author=author, original_text=main_text)
+
+    def _parse_story(self, html: str, url: str, soup: Optional[BeautifulSoup] = None) -> Story:
+        """
+        Parsea el HTML para extraer metadatos y el contenido principal de la
+        historia. `soup` evita volver a analizar un HTML que ya se analizó.
+        """
         logger.info("Parseando el contenido HTML de la historia.")
         try:
-            soup = BeautifulSoup(html, 'html.parser')
+            if soup is None:
+                soup = BeautifulSoup(html, HTML_PARSER)
 
             title_element = soup.find('h1')
             title = title_element.get_text(strip=True) if title_element else "Título no encontrado"
@@ -0,0 +1,92 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+class SubtitleRenderer:
+    """
+    Rasteriza subtítulos con Pillow, sin depender de ImageMagick.
+
+    Cada texto se ajusta por palabras al ancho indicado y se dibuja centrado
+    sobre un lienzo RGBA transparente. Las imágenes resultantes se guardan en
+    una caché LRU por (texto, fuente, tamaño, color, ancho).
+    """
+
+    def __init__(self, font: str, font_color: str, max_entries: int = 512):
+        self.font = font
+        self.font_color = font_color
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._fonts: Dict[int, ImageFont.FreeTypeFont] = {}
+
+    def _load_font(self, size: int) -> ImageFont.ImageFont:
+        if size not in self._fonts:
+            font = None
+            for candidate in (self.font, f"{self.font}.ttf", f"{self.font.lower()}.ttf", "DejaVuSans.ttf"):
+                try:
+                    font = ImageFont.truetype(candidate, size)
+                    break
+                except OSError:
+                    continue
+            if font is None:
+                logger.warning(f"No se encontró la fuente '{self.font}'. Usando la fuente por defecto de Pillow.")
+                font = ImageFont.load_default(size=size)
+            self._fonts[size] = font
+        return self._fonts[size]
+
+    def _wrap(self, text: str, font: ImageFont.ImageFont, max_width: int) -> List[str]:
+        lines: List[str] = []
+        for paragraph in text.split('\n'):
+            current = ""
+            for word in paragraph.split():
+                candidate = f"{current} {word}" if current else word
+                if current and font.getlength(candidate) > max_width:
+                    lines.append(current)
+                    current = word
+                else:
+                    current = candidate
+            lines.append(current)
+        return lines
+
+    def render(self, text: str, fontsize: int, max_width: int, line_spacing: float = 1.2) -> np.ndarray:
+        """Devuelve el subtítulo como array RGBA (alto x ancho x 4), usando la caché si es posible."""
+        key = (text, self.font, fontsize, self.font_color, max_width, line_spacing)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return cached
+
+        self.misses += 1
+        image = self._draw(text, fontsize, max_width, line_spacing)
+        image.setflags(write=False)
+        self._cache[key] = image
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return image
+
+    def _draw(self, text: str, fontsize: int, max_width: int, line_spacing: float) -> np.ndarray:
+        font = self._load_font(fontsize)
+        lines = self._wrap(text, font, max_width)
+        ascent, descent = font.getmetrics()
+        line_height = int((ascent + descent) * line_spacing)
+        stroke = max(1, fontsize // 20)
+
+        width = max_width + 2 * stroke
+        height = line_height * len(lines) + 2 * stroke
+        canvas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(canvas)
+        for i, line in enumerate(lines):
+            x = (width - font.getlength(line)) / 2
+            y = stroke + i * line_height
+            draw.text((x, y), line, font=font, fill=self.font_color, stroke_width=stroke, stroke_fill='black')
+        return np.asarray(canvas)
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
@@ -0,0 +1,50 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+
+class TermMatcher:
+    """
+    Índice de términos protegidos compilado una sola vez por lote.
+
+    Todos los términos se combinan en una única expresión regular alternada
+    (los más largos primero), de modo que cada párrafo se protege en una sola
+    pasada y la restauración también es una única sustitución.
+    """
+
+    placeholder_pattern = re.compile(r'__TERM\d+__')
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms: List[str] = []
+        self._index: Dict[str, int] = {}
+        for term in sorted({t for t in terms if t}):
+            key = term.lower()
+            if key not in self._index:
+                self._index[key] = len(self.terms)
+                self.terms.append(term)
+
+        if self.terms:
+            alternation = "|".join(re.escape(t) for t in sorted(self.terms, key=len, reverse=True))
+            self._pattern = re.compile(r'\b(?:' + alternation + r')\b', re.IGNORECASE)
+        else:
+            self._pattern = None
+
+    def protect(self, text: str) -> Tuple[str, Dict[str, str]]:
+        """Sustituye los términos por marcadores y devuelve el texto y el mapa marcador -> término."""
+        if self._pattern is None:
+            return text, {}
+
+        current_map: Dict[str, str] = {}
+
+        def _replace(match: re.Match) -> str:
+            i = self._index[match.group(0).lower()]
+            placeholder = f"__TERM{i}__"
+            current_map[placeholder] = self.terms[i]
+            return placeholder
+
+        return self._pattern.sub(_replace, text), current_map
+
+    @classmethod
+    def restore(cls, text: str, current_map: Dict[str, str]) -> str:
+        """Reemplaza los marcadores por sus términos originales en una sola pasada."""
+        if not current_map:
+            return text
+        return cls.placeholder_pattern.sub(lambda m: current_map.get(m.group(0), m.group(0)), text)
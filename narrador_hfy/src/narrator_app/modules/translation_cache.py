@@ -0,0 +1,124 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Formato de la clave; cambiarlo invalida las entradas guardadas con el anterior.
+KEY_VERSION = 2
+
+class TranslationCache:
+    """
+    Caché persistente de traducciones en SQLite, direccionada por contenido.
+
+    La clave combina el nombre del modelo, el conjunto de términos protegidos
+    y un hash del párrafo original junto con los términos que se protegieron
+    en él (los de la configuración y los nombres propios detectados en su
+    lote), de modo que cambiar cualquiera de ellos invalida las entradas
+    anteriores. El tamaño se limita con expulsión LRU.
+    """
+
+    def __init__(self, db_path: str, model_name: str, protected_terms: Iterable[str], max_entries: int = 50000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._namespace = self._build_namespace(model_name, protected_terms)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " translation TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON translations(last_used)")
+        self._conn.commit()
+        logger.info(f"Caché de traducción abierta en: {db_path}")
+
+    @staticmethod
+    def _build_namespace(model_name: str, protected_terms: Iterable[str]) -> str:
+        terms = "\x1f".join(sorted(protected_terms))
+        return hashlib.sha256(f"v{KEY_VERSION}\x1e{model_name}\x1e{terms}".encode('utf-8')).hexdigest()
+
+    def _key(self, text: str, matched_terms: Sequence[str] = ()) -> str:
+        payload = "\x1e".join([text, *sorted(matched_terms)])
+        return f"{self._namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, texts: Iterable[str],
+                 matched_terms: Optional[Dict[str, Sequence[str]]] = None) -> Dict[str, str]:
+        """
+        Devuelve las traducciones en caché para los textos dados y actualiza su uso.
+        `matched_terms` indica, por texto, los términos que se protegen en él.
+        """
+        matched_terms = matched_terms or {}
+        found: Dict[str, str] = {}
+        keys: Dict[str, str] = {}
+        now = time.time()
+        with self._lock:
+            for text in texts:
+                if text in found:
+                    continue
+                keys[text] = self._key(text, matched_terms.get(text, ()))
+                row = self._conn.execute(
+                    "SELECT translation FROM translations WHERE key = ?", (keys[text],)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                found[text] = row[0]
+            if found:
+                self._conn.executemany(
+                    "UPDATE translations SET last_used = ? WHERE key = ?",
+                    [(now, keys[text]) for text in found]
+                )
+                self._conn.commit()
+        return found
+
+    def get(self, text: str, matched_terms: Sequence[str] = ()) -> Optional[str]:
+        return self.get_many([text], {text: matched_terms}).get(text)
+
+    def put_many(self, translations: Dict[str, str], matched_terms: Optional[Dict[str, Sequence[str]]] = None):
+        """Guarda nuevas traducciones y aplica la expulsión LRU si se supera el límite."""
+        if not translations:
+            return
+        matched_terms = matched_terms or {}
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations (key, translation, last_used) VALUES (?, ?, ?)",
+                [(self._key(original, matched_terms.get(original, ())), translated, now)
+                 for original, translated in translations.items()]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            logger.info(f"Caché de traducción llena, expulsando {excess} entradas antiguas.")
+            self._conn.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
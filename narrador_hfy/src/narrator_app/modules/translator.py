@@ -1,11 +1,13 @@
 import logging
 import re
-import torch
-from transformers import pipeline, MarianMTModel, MarianTokenizer
-from typing import Dict, List, Set
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 from ..data_structures import Story
+from ..profiling import startup_profiler, tracer
 from ..utils import TranslationError
+from .term_matcher import TermMatcher
+from .translation_cache import TranslationCache
 
 logger = logging.getLogger(__name__)
 
@@ -17,20 +19,46 @@ class StoryTranslator:
 
     def __init__(self, config: Dict):
         self.config = config.get('translation', {})
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Inicializando StoryTranslator en el dispositivo: {self.device}")
 
         self.model_name = self.config.get('model', 'Helsinki-NLP/opus-mt-en-es')
-        self.cache: Dict[str, str] = {}
         self.protected_terms: Set[str] = set(self.config.get('protected_terms', []))
-
-        try:
-            self.tokenizer = MarianTokenizer.from_pretrained(self.model_name)
-            self.model = MarianMTModel.from_pretrained(self.model_name).to(self.device)
-            logger.info(f"Modelo de traducción '{self.model_name}' cargado correctamente.")
-        except Exception as e:
-            logger.error(f"No se pudo cargar el modelo de traducción: {e}")
-            raise TranslationError("Fallo al inicializar el modelo de traducción.") from e
+        # Presupuesto de tokens (con relleno) por llamada a model.generate y longitud
+        # máxima de entrada del modelo; los párrafos más largos se dividen por frases.
+        self.max_tokens_per_batch = self.config.get('max_tokens_per_batch', 4096)
+        self.max_input_tokens = self.config.get('max_input_tokens', 512)
+        self.sentence_pattern = re.compile(r'(?<=[.!?…])\s+')
+        self.cache = TranslationCache(
+            self.config.get('cache_path', 'data/cache/translations.sqlite3'),
+            self.model_name,
+            self.protected_terms,
+            max_entries=self.config.get('cache_max_entries', 50000),
+        )
+
+        # El modelo (y torch/transformers) se carga la primera vez que hace falta
+        # traducir algo: una historia servida por completo desde la caché no lo necesita.
+        self.device = None
+        self.tokenizer = None
+        self.model = None
+        self._model_lock = threading.Lock()
+
+    def ensure_model_loaded(self):
+        """Carga el tokenizador y el modelo Marian si aún no están en memoria."""
+        with self._model_lock:
+            if self.model is not None:
+                return
+            with startup_profiler.measure("load", "translator"):
+                try:
+                    import torch
+                    from transformers import MarianMTModel, MarianTokenizer
+
+                    self.device = "cuda" if torch.cuda.is_available() else "cpu"
+                    logger.info(f"Cargando el modelo de traducción en el dispositivo: {self.device}")
+                    self.tokenizer = MarianTokenizer.from_pretrained(self.model_name)
+                    self.model = MarianMTModel.from_pretrained(self.model_name).to(self.device)
+                    logger.info(f"Modelo de traducción '{self.model_name}' cargado correctamente.")
+                except Exception as e:
+                    logger.error(f"No se pudo cargar el modelo de traducción: {e}")
+                    raise TranslationError("Fallo al inicializar el modelo de traducción.") from e
 
     def translate_story(self, story: Story) -> Story:
         if not story.original_text:
@@ -44,7 +72,9 @@ class StoryTranslator:
         paragraphs = [p.strip() for p in paragraphs if p.strip()]
 
         try:
-            translated_paragraphs = self._translate_batch(paragraphs)
+            with tracer.span("translated", "stage") as span:
+                span.items, span.unit = len(paragraphs), "párrafos"
+                translated_paragraphs = self._translate_batch(paragraphs)
             story.translated_text = "\n\n".join(translated_paragraphs)
             logger.info("La historia ha sido traducida con éxito.")
         except Exception as e:
@@ -53,52 +83,157 @@ class StoryTranslator:
             
         return story
 
-    def _translate_batch(self, batch: List[str]) -> List[str]:
-        texts_to_translate = [text for text in batch if text not in self.cache]
-        
+    def translate_stream(self, paragraphs: List[str], chunk_size: int = 8) -> Iterator[str]:
+        """
+        Traduce los párrafos en lotes de `chunk_size` y devuelve cada traducción,
+        en orden, en cuanto su lote está listo (lo usa el pipeline en streaming).
+        Los nombres propios se buscan en todos los párrafos, como en
+        translate_story, así ambos modos protegen igual cada párrafo y comparten
+        las entradas de la caché.
+        """
+        matcher = self._term_matcher(paragraphs)
+        try:
+            for i in range(0, len(paragraphs), chunk_size):
+                yield from self._translate_batch(paragraphs[i:i + chunk_size], matcher)
+        except Exception as e:
+            logger.error(f"Ocurrió un error durante la traducción en streaming: {e}")
+            raise TranslationError("No se pudo traducir la historia completa.") from e
+
+    def _translate_batch(self, batch: List[str], matcher: Optional[TermMatcher] = None) -> List[str]:
+        # La protección de cada párrafo depende de los nombres propios de todo el
+        # lote (o de `matcher`, si se indica), así que se calcula antes de consultar
+        # la caché y forma parte de su clave.
+        unique_texts = list(dict.fromkeys(batch))
+        protected_texts, terms_maps = self._protect_terms(unique_texts, matcher)
+        protected = dict(zip(unique_texts, protected_texts))
+        terms_by_text = dict(zip(unique_texts, terms_maps))
+        matched_terms = {text: sorted(set(current_map.values())) for text, current_map in terms_by_text.items()}
+
+        translations = self.cache.get_many(unique_texts, matched_terms)
+        texts_to_translate = [text for text in unique_texts if text not in translations]
+        logger.info(f"Caché de traducción: {len(translations)} aciertos, {len(texts_to_translate)} fallos.")
+
         if texts_to_translate:
             logger.info(f"Traduciendo un lote de {len(texts_to_translate)} párrafos.")
-            
-            protected_batch, terms_map = self._protect_terms(texts_to_translate)
 
-            inputs = self.tokenizer(protected_batch, return_tensors="pt", padding=True, truncation=True).to(self.device)
-            translated_tokens = self.model.generate(**inputs)
-            raw_translations = self.tokenizer.batch_decode(translated_tokens, skip_special_tokens=True)
+            protected_batch = [protected[text] for text in texts_to_translate]
+            terms_map = [terms_by_text[text] for text in texts_to_translate]
 
-            restored_translations = self._restore_terms(raw_translations, terms_map)
-            
-            for original, translated in zip(texts_to_translate, restored_translations):
-                self.cache[original] = translated
+            # Los párrafos demasiado largos se dividen en fragmentos que se traducen
+            # por separado y se vuelven a unir en el orden original.
+            pieces: List[Tuple[int, str]] = []
+            for idx, text in enumerate(protected_batch):
+                pieces.extend((idx, piece) for piece in self._split_long_text(text))
 
-        return [self.cache[text] for text in batch]
+            translated_pieces = self._generate_bucketed([piece for _, piece in pieces])
+            joined: List[List[str]] = [[] for _ in protected_batch]
+            for (idx, _), translated in zip(pieces, translated_pieces):
+                joined[idx].append(translated)
+            raw_translations = [" ".join(parts) for parts in joined]
 
-    def _protect_terms(self, texts: List[str]) -> (List[str], List[Dict[str, str]]):
-        all_terms = self.protected_terms.union(self._find_proper_nouns(texts))
+            restored_translations = self._restore_terms(raw_translations, terms_map)
+
+            new_translations = dict(zip(texts_to_translate, restored_translations))
+            self.cache.put_many(new_translations, matched_terms)
+            translations.update(new_translations)
+
+        return [translations[text] for text in batch]
+
+    def _count_tokens(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        self.ensure_model_loaded()
+        return [len(ids) for ids in self.tokenizer(texts)["input_ids"]]
+
+    def _split_long_text(self, text: str) -> List[str]:
+        """Divide un texto que excede max_input_tokens en fragmentos por límites de frase."""
+        if self._count_tokens([text])[0] <= self.max_input_tokens:
+            return [text]
+
+        units: List[str] = []
+        sentences = self.sentence_pattern.split(text)
+        for sentence, length in zip(sentences, self._count_tokens(sentences)):
+            if length <= self.max_input_tokens:
+                units.append(sentence)
+                continue
+            # Una sola frase demasiado larga: se reparte por palabras.
+            words = sentence.split()
+            n_parts = -(-length // self.max_input_tokens)
+            step = -(-len(words) // n_parts)
+            units.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+
+        chunks: List[str] = []
+        current: List[str] = []
+        current_len = 0
+        for unit, length in zip(units, self._count_tokens(units)):
+            if current and current_len + length > self.max_input_tokens:
+                chunks.append(" ".join(current))
+                current, current_len = [], 0
+            current.append(unit)
+            current_len += length
+        if current:
+            chunks.append(" ".join(current))
+
+        logger.debug(f"Párrafo largo dividido en {len(chunks)} fragmentos.")
+        return chunks
+
+    def _generate_bucketed(self, texts: List[str]) -> List[str]:
+        """
+        Traduce los textos en lotes agrupados por longitud de tokens, de forma que
+        cada lote (longitud máxima × número de textos) no supere max_tokens_per_batch.
+        Devuelve las traducciones en el orden original.
+        """
+        import torch
+
+        lengths = self._count_tokens(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+
+        buckets: List[List[int]] = []
+        current: List[int] = []
+        for idx in order:
+            padded_len = min(lengths[idx], self.max_input_tokens)
+            if current and (len(current) + 1) * padded_len > self.max_tokens_per_batch:
+                buckets.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            buckets.append(current)
+
+        logger.info(f"Traduciendo {len(texts)} fragmentos en {len(buckets)} lotes por longitud.")
+        results: List[str] = [""] * len(texts)
+        for bucket in buckets:
+            inputs = self.tokenizer(
+                [texts[i] for i in bucket],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=self.max_input_tokens,
+            ).to(self.device)
+            with tracer.span("model.generate", tokens=sum(lengths[i] for i in bucket)) as span, torch.no_grad():
+                span.items, span.unit = len(bucket), "fragmentos"
+                translated_tokens = self.model.generate(**inputs)
+            decoded = self.tokenizer.batch_decode(translated_tokens, skip_special_tokens=True)
+            for idx, translated in zip(bucket, decoded):
+                results[idx] = translated
+        return results
+
+    def _term_matcher(self, texts: List[str]) -> TermMatcher:
+        return TermMatcher(self.protected_terms.union(self._find_proper_nouns(texts)))
+
+    def _protect_terms(self, texts: List[str], matcher: Optional[TermMatcher] = None) -> (List[str], List[Dict[str, str]]):
+        matcher = matcher or self._term_matcher(texts)
         protected_texts = []
         terms_map = []
 
         for text in texts:
-            current_map = {}
-            temp_text = text
-            for i, term in enumerate(all_terms):
-                placeholder = f"__TERM{i}__"
-                if re.search(r'\b' + re.escape(term) + r'\b', temp_text, re.IGNORECASE):
-                    temp_text = re.sub(r'\b' + re.escape(term) + r'\b', placeholder, temp_text, flags=re.IGNORECASE)
-                    current_map[placeholder] = term
-            protected_texts.append(temp_text)
+            protected_text, current_map = matcher.protect(text)
+            protected_texts.append(protected_text)
             terms_map.append(current_map)
-            
+
         return protected_texts, terms_map
 
     def _restore_terms(self, texts: List[str], terms_map: List[Dict[str, str]]) -> List[str]:
-        restored_texts = []
-        for i, text in enumerate(texts):
-            temp_text = text
-            current_map = terms_map[i]
-            for placeholder, term in current_map.items():
-                temp_text = temp_text.replace(placeholder, term)
-            restored_texts.append(temp_text)
-        return restored_texts
+        return [TermMatcher.restore(text, current_map) for text, current_map in zip(texts, terms_map)]
 
     def _find_proper_nouns(self, texts: List[str]) -> Set[str]:
         proper_nouns = set()
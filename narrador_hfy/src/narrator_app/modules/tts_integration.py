@@ -1,39 +1,113 @@
+import hashlib
 import logging
+import multiprocessing
 import os
-import torch
-from TTS.api import TTS
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import numpy as np
 from pydub import AudioSegment
-from typing import Dict, List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from ..data_structures import Story, Dialogue, Character
+from ..profiling import startup_profiler, tracer
 from ..utils import TTSError
+from .audio_cache import AudioCache
+from .ffmpeg_renderer import wav_duration
 
 logger = logging.getLogger(__name__)
 
+# Instancia propia de cada proceso trabajador del modo multi-proceso, o el error
+# que impidió crearla.
+_worker_tts: Optional["TTSIntegration"] = None
+_worker_error: Optional[str] = None
+
+def _init_worker(config: Dict, num_threads: int):
+    """
+    Inicializa un proceso trabajador. El modelo XTTS se carga en su primer
+    trabajo, así un fallo al cargarlo se informa como error de cada segmento.
+    """
+    global _worker_tts, _worker_error
+    try:
+        import torch
+
+        torch.set_num_threads(num_threads)
+        _worker_tts = TTSIntegration(config, device="cpu")
+    except Exception as e:
+        _worker_error = f"No se pudo inicializar el proceso de síntesis: {e}"
+
+def _worker_synthesize(job: Tuple[int, str, str, str]) -> Tuple[int, Optional[str], List[Dict]]:
+    index, text, speaker_wav_path, output_path = job
+    if _worker_tts is None:
+        return index, _worker_error, []
+    try:
+        _worker_tts.ensure_model_loaded()
+    except Exception as e:
+        return index, str(e), tracer.drain()
+    error = _worker_tts._synthesize_with_retries(index, text, speaker_wav_path, output_path)
+    # Las mediciones del trabajador viajan con el resultado al proceso principal.
+    return index, error, tracer.drain()
+
 class TTSIntegration:
     """
     Gestiona la síntesis de voz usando Coqui TTS (XTTSv2).
     Convierte un guion estructurado en archivos de audio.
     """
 
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, device: Optional[str] = None):
+        self.app_config = config
         self.config = config.get('tts', {})
         self.paths_config = config.get('paths', {})
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Inicializando TTSIntegration en el dispositivo: {self.device}")
+        # El dispositivo se decide al cargar el modelo si no se indica uno.
+        self.device = device
+        self.workers = self.config.get('workers', 1)
+        self.max_retries = self.config.get('max_retries', 2)
+        self.failed_segments: Dict[int, str] = {}
+        # Planificación por frases: longitud máxima de cada llamada de inferencia y
+        # silencio insertado al unir los fragmentos de un mismo segmento.
+        self.max_chunk_chars = self.config.get('max_chunk_chars', 220)
+        self.sentence_silence_ms = self.config.get('sentence_silence_ms', 150)
+        self.sentence_pattern = re.compile(r'(?<=[.!?…;:])\s+')
+        # Latentes y hash de cada WAV de referencia. Clave: (ruta, mtime, tamaño),
+        # así un WAV reemplazado no reutiliza los datos de la versión anterior.
+        self._latents: Dict[Tuple[str, float, int], Tuple[Any, Any]] = {}
+        self._voice_hashes: Dict[Tuple[str, float, int], str] = {}
+        self.audio_cache: Optional[AudioCache] = None
+        if self.config.get('audio_cache_enabled', True):
+            self.audio_cache = AudioCache(
+                self.config.get('audio_cache_path', 'data/cache/audio'),
+                max_bytes=self.config.get('audio_cache_max_bytes', 2 * 1024 ** 3),
+            )
+        self.model_name = self.config.get('model', 'tts_models/multilingual/multi-dataset/xtts_v2')
+        # XTTS (y torch) se cargan en el primer segmento que no está en la caché de
+        # audio; en modo multi-proceso cada trabajador carga su propia copia.
+        self._tts_engine = None
+        self._model_lock = threading.Lock()
 
-        self._load_model()
         self._load_voice_bank()
 
-    def _load_model(self):
-        try:
-            model_name = self.config.get('model', 'tts_models/multilingual/multi-dataset/xtts_v2')
-            logger.info(f"Cargando modelo TTS: {model_name}...")
-            self.tts_engine = TTS(model_name).to(self.device)
-            logger.info("Modelo TTS cargado correctamente.")
-        except Exception as e:
-            logger.error(f"No se pudo cargar el modelo TTS. Asegúrate de que los modelos están descargados. Error: {e}")
-            raise TTSError("Fallo al inicializar el modelo TTS.") from e
+    @property
+    def tts_engine(self):
+        self.ensure_model_loaded()
+        return self._tts_engine
+
+    def ensure_model_loaded(self):
+        """Carga el modelo TTS si aún no está en memoria."""
+        with self._model_lock:
+            if self._tts_engine is not None:
+                return
+            with startup_profiler.measure("load", "tts_integration"):
+                try:
+                    import torch
+                    from TTS.api import TTS
+
+                    self.device = self.device or ("cuda" if torch.cuda.is_available() else "cpu")
+                    logger.info(f"Cargando modelo TTS: {self.model_name} en el dispositivo: {self.device}...")
+                    self._tts_engine = TTS(self.model_name).to(self.device)
+                    logger.info("Modelo TTS cargado correctamente.")
+                except Exception as e:
+                    logger.error(f"No se pudo cargar el modelo TTS. Asegúrate de que los modelos están descargados. Error: {e}")
+                    raise TTSError("Fallo al inicializar el modelo TTS.") from e
 
     def _load_voice_bank(self):
         self.voice_bank: Dict[str, str] = {}
@@ -51,42 +125,302 @@ class TTSIntegration:
         
         logger.info(f"Voces cargadas: {list(self.voice_bank.keys())}")
 
-    def synthesize_script(self, story: Story, temp_audio_dir: str) -> Story:
-        logger.info(f"Iniciando síntesis de voz para la historia: '{story.title}'")
-        os.makedirs(temp_audio_dir, exist_ok=True)
-        
-        char_map = {char.id: char for char in story.characters}
-        char_map['narrator'] = Character(id='narrator', name='Narrador', voice_archetype=self.config.get('narrator_voice', 'narrador'))
+    def _xtts_model(self):
+        """Devuelve el modelo XTTS subyacente si admite latentes de condicionamiento."""
+        synthesizer = getattr(self.tts_engine, 'synthesizer', None)
+        model = getattr(synthesizer, 'tts_model', None)
+        if model is not None and hasattr(model, 'get_conditioning_latents'):
+            return model
+        return None
 
-        for i, dialogue in enumerate(story.script):
-            output_path = os.path.join(temp_audio_dir, f"segment_{i:04d}.wav")
-            
-            character = char_map.get(dialogue.character_id)
-            if not character:
-                logger.warning(f"Personaje con ID '{dialogue.character_id}' no encontrado. Usando voz de narrador.")
-                character = char_map['narrator']
+    @staticmethod
+    def _voice_key(speaker_wav_path: str) -> Tuple[str, float, int]:
+        stat = os.stat(speaker_wav_path)
+        return os.path.abspath(speaker_wav_path), stat.st_mtime, stat.st_size
 
-            voice_archetype = character.voice_archetype
-            speaker_wav_path = self.voice_bank.get(voice_archetype)
+    def _voice_hash(self, speaker_wav_path: str) -> str:
+        """Hash del contenido del WAV de referencia, calculado una vez por versión del archivo."""
+        key = self._voice_key(speaker_wav_path)
+        if key not in self._voice_hashes:
+            with open(speaker_wav_path, 'rb') as f:
+                self._voice_hashes[key] = hashlib.sha256(f.read()).hexdigest()
+        return self._voice_hashes[key]
 
-            if not speaker_wav_path:
-                logger.error(f"Arquetipo de voz '{voice_archetype}' no encontrado en el banco de voces. Usando voz de narrador por defecto.")
-                speaker_wav_path = self.voice_bank.get(char_map['narrator'].voice_archetype)
-                if not speaker_wav_path:
-                     raise TTSError("No se encuentra ni la voz del personaje ni la del narrador.")
+    def _latents_cache_path(self, speaker_wav_path: str) -> str:
+        directory = os.path.join(os.path.dirname(speaker_wav_path), '.latents')
+        name = os.path.splitext(os.path.basename(speaker_wav_path))[0]
+        return os.path.join(directory, f"{name}.pt")
+
+    def _get_conditioning_latents(self, speaker_wav_path: str) -> Tuple[Any, Any]:
+        """
+        Obtiene los latentes (gpt_cond_latent, speaker_embedding) de una voz.
+        Se calculan una sola vez por voz, se guardan en memoria y en disco junto
+        al banco de voces, y se invalidan si cambia el contenido del WAV de
+        referencia.
+        """
+        key = self._voice_key(speaker_wav_path)
+        if key in self._latents:
+            return self._latents[key]
 
+        import torch
+
+        cache_path = self._latents_cache_path(speaker_wav_path)
+        wav_hash = self._voice_hash(speaker_wav_path)
+
+        latents = None
+        if os.path.exists(cache_path):
             try:
-                logger.debug(f"Generando audio para: [{character.name}] '{dialogue.text[:30]}...'")
-                self.tts_engine.tts_to_file(
-                    text=dialogue.text,
-                    speaker_wav=speaker_wav_path,
-                    language=self.config.get('language', 'es'),
-                    file_path=output_path,
-                )
-                dialogue.audio_path = output_path
+                cached = torch.load(cache_path, map_location=self.device)
+                if cached.get('model') == self.model_name and cached.get('sha256') == wav_hash:
+                    latents = (cached['gpt_cond_latent'], cached['speaker_embedding'])
+                    logger.info(f"Latentes de voz cargados desde caché: {cache_path}")
             except Exception as e:
-                logger.error(f"Fallo al generar audio para el segmento {i}: {e}")
-                dialogue.audio_path = None
-        
-        logger.info("Síntesis de voz completada para todos los segmentos.")
+                logger.warning(f"No se pudo leer la caché de latentes {cache_path}: {e}")
+
+        if latents is None:
+            logger.info(f"Calculando latentes de condicionamiento para: {speaker_wav_path}")
+            latents = self._xtts_model().get_conditioning_latents(audio_path=[speaker_wav_path])
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                torch.save({
+                    'model': self.model_name,
+                    'sha256': wav_hash,
+                    'gpt_cond_latent': latents[0],
+                    'speaker_embedding': latents[1],
+                }, tmp_path)
+                os.replace(tmp_path, cache_path)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar la caché de latentes {cache_path}: {e}")
+
+        self._latents[key] = latents
+        return latents
+
+    def _synthesize_segment(self, text: str, speaker_wav_path: str, output_path: str):
+        """Sintetiza un texto en un WAV, usando los latentes en caché si el modelo es XTTS."""
+        language = self.config.get('language', 'es')
+        model = self._xtts_model()
+        if model is None:
+            self.tts_engine.tts_to_file(
+                text=text,
+                speaker_wav=speaker_wav_path,
+                language=language,
+                file_path=output_path,
+            )
+            return
+
+        import torch
+
+        gpt_cond_latent, speaker_embedding = self._get_conditioning_latents(speaker_wav_path)
+        sample_rate = self.tts_engine.synthesizer.output_sample_rate
+        silence = np.zeros(int(sample_rate * self.sentence_silence_ms / 1000), dtype=np.float32)
+
+        waveforms = []
+        for chunk in self._plan_chunks(text):
+            with torch.no_grad():
+                result = model.inference(chunk, language, gpt_cond_latent, speaker_embedding)
+            if waveforms:
+                waveforms.append(silence)
+            waveforms.append(np.asarray(result['wav'], dtype=np.float32).reshape(-1))
+        self.tts_engine.synthesizer.save_wav(np.concatenate(waveforms), output_path)
+
+    def _plan_chunks(self, text: str) -> List[str]:
+        """
+        Divide el texto de un segmento en fragmentos para la inferencia: los
+        párrafos largos se separan por frases y las frases cortas consecutivas
+        se agrupan en una sola llamada de hasta max_chunk_chars caracteres.
+        """
+        units: List[str] = []
+        for sentence in self.sentence_pattern.split(text.strip()):
+            if len(sentence) <= self.max_chunk_chars:
+                units.append(sentence)
+                continue
+            # Frase demasiado larga: se reparte por palabras.
+            current = ""
+            for word in sentence.split():
+                if current and len(current) + 1 + len(word) > self.max_chunk_chars:
+                    units.append(current)
+                    current = word
+                else:
+                    current = f"{current} {word}" if current else word
+            if current:
+                units.append(current)
+
+        chunks: List[str] = []
+        for unit in units:
+            if not unit:
+                continue
+            if chunks and len(chunks[-1]) + 1 + len(unit) <= self.max_chunk_chars:
+                chunks[-1] = f"{chunks[-1]} {unit}"
+            else:
+                chunks.append(unit)
+        return chunks or [text]
+
+    @property
+    def render_signature(self) -> str:
+        """Identifica el modelo y los parámetros que afectan al audio generado."""
+        return f"{self.model_name}|chunk={self.max_chunk_chars}|silence={self.sentence_silence_ms}"
+
+    def synthesize_script(
+        self,
+        story: Story,
+        temp_audio_dir: str,
+        progress_callback: Optional[Callable[[float, str], Any]] = None,
+    ) -> Story:
+        logger.info(f"Iniciando síntesis de voz para la historia: '{story.title}'")
+        total = len(story.script)
+
+        for completed, _ in enumerate(self.synthesize_stream(story, range(total), temp_audio_dir), start=1):
+            if progress_callback:
+                progress_callback(completed / total, f"Segmento {completed}/{total} sintetizado")
+
+        if self.audio_cache is not None:
+            logger.info(f"Estadísticas de la caché de audio: {self.audio_cache.stats()}")
+        if self.failed_segments:
+            logger.error(f"Fallaron {len(self.failed_segments)} segmentos: {sorted(self.failed_segments)}")
+        else:
+            logger.info("Síntesis de voz completada para todos los segmentos.")
         return story
+
+    def synthesize_stream(self, story: Story, indices: Iterable[int], temp_audio_dir: str) -> Iterator[int]:
+        """
+        Sintetiza los segmentos de `story.script` indicados por `indices` a medida
+        que llegan, y devuelve cada índice en cuanto su audio está listo (o ha
+        fallado). `indices` puede ser un iterable que se va produciendo mientras
+        otra etapa amplía el guion; los personajes se resuelven en el momento.
+        Los resultados llegan en orden de finalización. Los segmentos fallidos
+        quedan en `failed_segments`, que se vacía al empezar.
+        """
+        self.failed_segments = {}
+        with tracer.span("synthesized", "stage", workers=self.workers) as span:
+            span.items, span.unit = 0.0, "audio_s"
+            for index in self._synthesize_stream(story, indices, temp_audio_dir):
+                audio_path = story.script[index].audio_path
+                if audio_path:
+                    span.items += wav_duration(audio_path)
+                yield index
+
+    def _synthesize_stream(self, story: Story, indices: Iterable[int], temp_audio_dir: str) -> Iterator[int]:
+        os.makedirs(temp_audio_dir, exist_ok=True)
+        pool: Optional[ProcessPoolExecutor] = None
+        pending: Dict[Future, Tuple[int, str, str, str, Optional[str]]] = {}
+        char_map = {'narrator': Character(id='narrator', name='Narrador', voice_archetype=self.config.get('narrator_voice', 'narrador'))}
+
+        try:
+            for index in indices:
+                job = self._prepare_job(story, index, temp_audio_dir, char_map)
+                if job is None:
+                    yield index
+                elif self.workers <= 1:
+                    self._finish_job(story, job, self._synthesize_with_retries(*job[:4]))
+                    yield index
+                else:
+                    if pool is None:
+                        pool = self._start_pool()
+                    pending[pool.submit(_worker_synthesize, job[:4])] = job
+
+                # Entrega los segmentos que ya terminaron sin bloquear la entrada.
+                for future in [future for future in pending if future.done()]:
+                    yield self._collect(story, future, pending.pop(future))
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield self._collect(story, future, pending.pop(future))
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    def _collect(self, story: Story, future: Future, job: Tuple[int, str, str, str, Optional[str]]) -> int:
+        """
+        Recoge el resultado de un trabajo del modo multi-proceso. Si un proceso
+        muere (falta de memoria, fallo de la librería nativa), el pool queda roto
+        y sus trabajos terminan con BrokenProcessPool: se marcan como fallidos.
+        """
+        try:
+            _, error, events = future.result()
+            tracer.merge(events)
+        except Exception as e:
+            error = f"El proceso de síntesis terminó de forma inesperada: {e!r}"
+        self._finish_job(story, job, error)
+        return job[0]
+
+    def _prepare_job(self, story: Story, index: int, temp_audio_dir: str,
+                     char_map: Dict[str, Character]) -> Optional[Tuple[int, str, str, str, Optional[str]]]:
+        """
+        Prepara el trabajo de síntesis de un segmento. Si su audio está en la caché,
+        lo copia a su sitio y devuelve None. `char_map` se comparte entre los
+        segmentos de la historia y se completa cuando aparece un personaje nuevo.
+        """
+        dialogue = story.script[index]
+        output_path = os.path.join(temp_audio_dir, f"segment_{index:04d}.wav")
+
+        if dialogue.character_id not in char_map:
+            char_map.update((char.id, char) for char in story.characters if char.id != 'narrator')
+        speaker_wav_path = self._resolve_speaker_wav(dialogue, char_map)
+
+        cache_key = None
+        if self.audio_cache is not None:
+            language = self.config.get('language', 'es')
+            cache_key = AudioCache.make_key(dialogue.text, self._voice_hash(speaker_wav_path), language, self.render_signature)
+            if self.audio_cache.fetch(cache_key, output_path):
+                dialogue.audio_path = output_path
+                return None
+
+        return index, dialogue.text, speaker_wav_path, output_path, cache_key
+
+    def _finish_job(self, story: Story, job: Tuple[int, str, str, str, Optional[str]], error: Optional[str]):
+        index, _, _, output_path, cache_key = job
+        if error is None:
+            story.script[index].audio_path = output_path
+            if cache_key is not None:
+                self.audio_cache.store(cache_key, output_path)
+        else:
+            story.script[index].audio_path = None
+            self.failed_segments[index] = error
+
+    def _resolve_speaker_wav(self, dialogue: Dialogue, char_map: Dict[str, Character]) -> str:
+        character = char_map.get(dialogue.character_id)
+        if not character:
+            logger.warning(f"Personaje con ID '{dialogue.character_id}' no encontrado. Usando voz de narrador.")
+            character = char_map['narrator']
+
+        voice_archetype = character.voice_archetype
+        speaker_wav_path = self.voice_bank.get(voice_archetype)
+
+        if not speaker_wav_path:
+            logger.error(f"Arquetipo de voz '{voice_archetype}' no encontrado en el banco de voces. Usando voz de narrador por defecto.")
+            speaker_wav_path = self.voice_bank.get(char_map['narrator'].voice_archetype)
+            if not speaker_wav_path:
+                 raise TTSError("No se encuentra ni la voz del personaje ni la del narrador.")
+        return speaker_wav_path
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        """
+        Arranca los procesos de síntesis, cada uno con su propio modelo XTTS en
+        CPU (cargado en su primer trabajo). El proceso principal no carga ningún
+        modelo: cada trabajador calcula los latentes de las voces que usa, o los
+        lee de la caché en disco.
+        """
+        num_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        logger.info(f"Sintetizando con {self.workers} procesos ({num_threads} hilos cada uno).")
+        return ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(self.app_config, num_threads),
+        )
+
+    def _synthesize_with_retries(self, index: int, text: str, speaker_wav_path: str, output_path: str) -> Optional[str]:
+        """Sintetiza un segmento reintentando ante fallos. Devuelve el último error o None."""
+        error = None
+        with tracer.span("tts.segment", index=index, chars=len(text)) as span:
+            for attempt in range(1, self.max_retries + 2):
+                try:
+                    logger.debug(f"Generando audio para el segmento {index}: '{text[:30]}...'")
+                    self._synthesize_segment(text, speaker_wav_path, output_path)
+                    span.items, span.unit = wav_duration(output_path), "audio_s"
+                    return None
+                except Exception as e:
+                    error = str(e)
+                    logger.warning(f"Intento {attempt} fallido para el segmento {index}: {e}")
+        logger.error(f"Fallo al generar audio para el segmento {index}: {error}")
+        return error
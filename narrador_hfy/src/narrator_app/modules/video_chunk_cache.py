@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+def _link_or_copy(source: str, destination: str):
+    """Enlace duro (sin copiar datos); copia si el sistema de archivos no lo permite."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+class VideoChunkCache:
+    """
+    Caché de tramos de video ya codificados, direccionada por contenido.
+
+    La clave de cada tramo resume todo lo que determina sus imágenes (fondo,
+    parámetros de codificación, subtítulos y duración), así que al volver a
+    renderizar una historia solo se codifican los tramos que cambiaron; el
+    resto se reutiliza tal cual al concatenar. Como AudioCache, un índice
+    SQLite guarda el tamaño y el último uso de cada tramo para la expulsión LRU.
+
+    Los tramos se enlazan (enlace duro, o copia si no se puede) entre la caché
+    y el directorio de trabajo del render, nunca se usan en su sitio: así una
+    expulsión durante el render, de este o de otro proceso, no borra un tramo
+    que ya está en la lista de concatenación.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 10 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite3'), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " key TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_last_used ON chunks(last_used)")
+        self._conn.commit()
+        logger.info(f"Caché de tramos de video abierta en: {cache_dir}")
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        payload = "\x1e".join(parts)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.mp4")
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Enlaza el tramo en caché en output_path. Devuelve False si no existe."""
+        path = self._path(key)
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM chunks WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.exists(path):
+                self.misses += 1
+                return False
+            _link_or_copy(path, output_path)
+            self._conn.execute("UPDATE chunks SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return True
+
+    def store(self, key: str, chunk_path: str):
+        """Guarda un tramo recién codificado (chunk_path se queda donde está) y aplica el límite de tamaño."""
+        path = self._path(key)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            _link_or_copy(chunk_path, tmp_path)
+            os.replace(tmp_path, path)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks (key, size, last_used) VALUES (?, ?, ?)",
+                (key, os.path.getsize(path), time.time())
+            )
+            self._evict(keep=key)
+            self._conn.commit()
+
+    def _evict(self, keep: str):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunks").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM chunks ORDER BY last_used ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self._conn.execute("DELETE FROM chunks WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"Caché de tramos de video llena, {evicted} entradas expulsadas.")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chunks").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
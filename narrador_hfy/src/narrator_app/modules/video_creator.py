@@ -1,117 +1,222 @@
 import logging
 import os
-from moviepy.editor import (
-    AudioFileClip, CompositeVideoClip, ImageClip, TextClip,
-    concatenate_videoclips
-)
-from PIL import Image, ImageDraw, ImageFont
+import tempfile
+import numpy as np
+from PIL import Image
+from typing import Dict, List, Optional, Tuple
 
-from ..data_structures import Story, Dialogue
+from ..data_structures import Story
+from ..profiling import tracer
 from ..utils import VideoError
+from .audio_assembler import assemble_story_audio
+from .ffmpeg_renderer import FFmpegRenderer
+from .subtitle_renderer import SubtitleRenderer
 
 logger = logging.getLogger(__name__)
 
+# Fondos ya decodificados y redimensionados, compartidos por todos los clips y
+# entre historias del mismo proceso. Clave: (ruta, mtime, resolución).
+_background_cache: Dict[Tuple[str, float, Tuple[int, int]], np.ndarray] = {}
+
+def apply_render_profile(video_config: Dict, profile: Optional[str]) -> Dict:
+    """
+    Devuelve la configuración de video con el perfil de render indicado
+    (video.profiles) aplicado encima. Si el perfil cambia la resolución y no
+    fija el tamaño de letra, este se escala con la altura.
+    """
+    if not profile:
+        return video_config
+    profiles = video_config.get('profiles', {})
+    if profile not in profiles:
+        raise VideoError(f"Perfil de render desconocido: '{profile}'. Disponibles: {', '.join(profiles)}")
+    overrides = profiles[profile] or {}
+    merged = {**video_config, **overrides, 'profile': profile}
+    if 'resolution' in overrides and 'fontsize' not in overrides:
+        base_height = video_config.get('resolution', [1920, 1080])[1]
+        merged['fontsize'] = max(1, round(video_config.get('fontsize', 48) * overrides['resolution'][1] / base_height))
+    return merged
+
 class VideoCreator:
     """
     Crea un video final combinando audio, imágenes y subtítulos.
     """
 
     def __init__(self, config: dict):
-        self.config = config.get('video', {})
+        self.full_config = config
+        self.profile: Optional[str] = config.get('video', {}).get('profile')
+        self.config = apply_render_profile(config.get('video', {}), self.profile)
+        self.audio_config = config.get('audio', {})
         self.paths_config = config.get('paths', {})
         self.resolution = tuple(self.config.get('resolution', [1920, 1080]))
         self.fps = self.config.get('fps', 24)
         self.font = self.config.get('font', 'Arial')
         self.fontsize = self.config.get('fontsize', 48)
         self.font_color = self.config.get('font_color', 'white')
-        logger.info("VideoCreator inicializado.")
+        # 'ffmpeg' codifica el video en tramos con ffmpeg; 'moviepy' lo compone fotograma a fotograma en Python.
+        self.engine = self.config.get('engine', 'ffmpeg')
+        # Perfiles sin video: solo se exporta la narración (m4a u opus).
+        self.audio_only = self.config.get('audio_only', False)
+        self.audio_format = self.config.get('audio_format', 'm4a')
+        self.subtitle_renderer = SubtitleRenderer(
+            self.font, self.font_color, max_entries=self.config.get('subtitle_cache_size', 512)
+        )
+        self.ffmpeg_renderer = FFmpegRenderer(self.config, self.subtitle_renderer)
+        self._profile_creators: Dict[str, "VideoCreator"] = {}
+        if self.engine == 'moviepy' and not self.audio_only:
+            logger.warning(
+                "El motor moviepy compone y codifica cada fotograma en un único proceso: "
+                "video.static_frames, chunk_segments y encode_workers solo se aplican con el motor ffmpeg."
+            )
+        logger.info(f"VideoCreator inicializado (motor: {self.engine}, perfil: {self.profile or 'ninguno'}).")
+
+    def for_profile(self, profile: Optional[str]) -> "VideoCreator":
+        """VideoCreator con el perfil de render indicado; None usa el perfil por defecto (video.profile)."""
+        if not profile or profile == self.profile:
+            return self
+        creator = self._profile_creators.get(profile)
+        if creator is None:
+            video_config = {**self.full_config.get('video', {}), 'profile': profile}
+            creator = VideoCreator({**self.full_config, 'video': video_config})
+            self._profile_creators[profile] = creator
+        return creator
+
+    def output_path(self, story: Story, profile: Optional[str] = None) -> str:
+        """Ruta del archivo final: título de la historia, sufijo del perfil y extensión de su formato."""
+        creator = self.for_profile(profile)
+        extension = creator.audio_format if creator.audio_only else 'mp4'
+        name = f"{story.title.replace(' ', '_')}{creator.config.get('suffix', '')}.{extension}"
+        return os.path.join(self.paths_config.get('output_videos', 'data/output/'), name)
+
+    def create_video_from_story(self, story: Story, output_video_path: str, narration_path: Optional[str] = None,
+                                timings: Optional[List[Tuple[int, float, float]]] = None,
+                                profile: Optional[str] = None):
+        """
+        Crea el video a partir de la pista de narración y su tabla de tiempos
+        (índice del segmento, inicio, fin). Si no se indican, se ensamblan aquí
+        a partir del audio de cada segmento. `profile` elige un perfil de
+        render distinto del configurado por defecto.
+        """
+        creator = self.for_profile(profile)
+        if creator is not self:
+            return creator.create_video_from_story(story, output_video_path, narration_path, timings)
+        logger.info(f"Iniciando creación de video para: '{story.title}' (perfil: {self.profile or 'ninguno'})")
+        if narration_path is None or timings is None:
+            with tempfile.TemporaryDirectory(prefix="narrador_audio_") as work_dir:
+                narration_path = os.path.join(work_dir, "narration.wav")
+                timings = assemble_story_audio(story, narration_path, self.audio_config, self.fps)
+                self._render_stage(story, output_video_path, narration_path, timings)
+        else:
+            self._render_stage(story, output_video_path, narration_path, timings)
+
+    def _render_stage(self, story: Story, output_video_path: str, narration_path: str,
+                      timings: List[Tuple[int, float, float]]):
+        if self.audio_only:
+            with tracer.span("rendered", "stage", engine="audio") as span:
+                duration = self.ffmpeg_renderer.render_audio(story, narration_path, output_video_path)
+                span.items, span.unit = duration, "audio_s"
+            return
+        with tracer.span("rendered", "stage", engine=self.engine) as span:
+            duration = self._render(story, output_video_path, narration_path, timings)
+            span.items, span.unit = duration * self.fps, "frames"
+
+    def _render(self, story: Story, output_video_path: str, narration_path: str,
+                timings: List[Tuple[int, float, float]]) -> float:
+        """Renderiza con el motor configurado y devuelve la duración del video en segundos."""
+        if not timings:
+            raise VideoError("No se pudo crear ningún segmento de video.")
 
-    def create_video_from_story(self, story: Story, output_video_path: str):
-        logger.info(f"Iniciando creación de video para: '{story.title}'")
-        
         bg_image_path = self.config.get('default_background', 'data/default_bg.png')
         if not os.path.exists(bg_image_path):
             logger.warning(f"No se encontró la imagen de fondo. Creando una por defecto.")
             self._create_default_background(bg_image_path)
 
-        video_segments = []
-
-        title_clip = self._create_title_clip(story.title, story.author, bg_image_path)
-        video_segments.append(title_clip)
+        if self.engine == 'ffmpeg':
+            return self.ffmpeg_renderer.render(story, bg_image_path, output_video_path, narration_path, timings)
 
-        for dialogue in story.script:
-            if not dialogue.audio_path or not os.path.exists(dialogue.audio_path):
-                logger.warning(f"Saltando segmento sin audio: {dialogue.text[:30]}...")
-                continue
-            
-            try:
-                segment_clip = self._create_segment_clip(dialogue, bg_image_path)
-                video_segments.append(segment_clip)
-            except Exception as e:
-                logger.error(f"No se pudo crear el clip para el segmento '{dialogue.text[:30]}...': {e}")
-
-        if not video_segments:
-            raise VideoError("No se pudo crear ningún segmento de video.")
+        # moviepy solo se importa con su motor: el motor ffmpeg no lo necesita.
+        from moviepy.editor import concatenate_videoclips
 
-        final_clip = concatenate_videoclips(video_segments, method="compose")
+        bg_frame = self._load_background(bg_image_path)
+        title_clip = self._create_title_clip(story.title, story.author, bg_frame)
+        narration_clip = self._create_narration_clip(story, narration_path, timings, bg_frame)
+        final_clip = concatenate_videoclips([title_clip, narration_clip], method="compose")
 
         try:
             logger.info(f"Exportando video final a: {output_video_path}")
-            final_clip.write_videofile(
-                output_video_path,
-                fps=self.fps,
-                codec='libx264',
-                audio_codec='aac',
-                temp_audiofile='temp-audio.m4a',
-                remove_temp=True
-            )
+            with tracer.span("write_videofile", segments=len(timings)) as span:
+                span.items, span.unit = final_clip.duration * self.fps, "frames"
+                final_clip.write_videofile(
+                    output_video_path,
+                    fps=self.fps,
+                    codec='libx264',
+                    preset=self.config.get('preset', 'medium'),
+                    ffmpeg_params=self.ffmpeg_renderer.quality_args(),
+                    audio_codec='aac',
+                    temp_audiofile='temp-audio.m4a',
+                    remove_temp=True
+                )
             logger.info("Video exportado con éxito.")
+            logger.info(f"Caché de subtítulos: {self.subtitle_renderer.stats()}")
         except Exception as e:
             logger.error(f"Fallo al exportar el video final: {e}")
             raise VideoError("No se pudo escribir el archivo de video final.") from e
+        finally:
+            narration_clip.audio.close()
+        return final_clip.duration
+
+    def _load_background(self, bg_path: str) -> np.ndarray:
+        """Decodifica y redimensiona el fondo una sola vez; los clips comparten el mismo array."""
+        key = (os.path.abspath(bg_path), os.path.getmtime(bg_path), self.resolution)
+        frame = _background_cache.get(key)
+        if frame is None:
+            logger.info(f"Decodificando imagen de fondo: {bg_path}")
+            with Image.open(bg_path) as img:
+                frame = np.asarray(img.convert('RGB').resize(self.resolution, Image.LANCZOS))
+            frame.setflags(write=False)
+            _background_cache[key] = frame
+        return frame
+
+    def _create_title_clip(self, title: str, author: str, bg_frame: np.ndarray) -> "CompositeVideoClip":
+        from moviepy.editor import CompositeVideoClip, ImageClip
 
-    def _create_title_clip(self, title: str, author: str, bg_path: str) -> CompositeVideoClip:
         duration = self.config.get('title_duration_s', 5)
         
-        bg_clip = ImageClip(bg_path, duration=duration).resize(self.resolution)
+        bg_clip = ImageClip(bg_frame, duration=duration)
         
-        title_text = TextClip(
-            txt=title,
-            fontsize=self.fontsize * 1.5,
-            color=self.font_color,
-            font=self.font,
-            size=self.resolution,
-            method='caption'
-        ).set_position(('center', 'center')).set_duration(duration)
-
-        author_text = TextClip(
-            txt=f"por {author}",
-            fontsize=self.fontsize * 0.8,
-            color=self.font_color,
-            font=self.font
-        ).set_position(('center', title_text.pos(title_text.start)[1] + title_text.size[1])).set_duration(duration)
+        text_width = int(self.resolution[0] * 0.8)
+        title_image = self.subtitle_renderer.render(title, int(self.fontsize * 1.5), text_width)
+        author_image = self.subtitle_renderer.render(f"por {author}", int(self.fontsize * 0.8), text_width)
+
+        title_y = (self.resolution[1] - title_image.shape[0] - author_image.shape[0]) // 2
+        title_text = ImageClip(title_image, transparent=True, duration=duration).set_position(('center', title_y))
+        author_text = ImageClip(author_image, transparent=True, duration=duration).set_position(
+            ('center', title_y + title_image.shape[0])
+        )
 
         return CompositeVideoClip([bg_clip, title_text, author_text])
 
-    def _create_segment_clip(self, dialogue: Dialogue, bg_path: str) -> CompositeVideoClip:
-        audio_clip = AudioFileClip(dialogue.audio_path)
+    def _create_narration_clip(self, story: Story, narration_path: str, timings: List[Tuple[int, float, float]],
+                               bg_frame: np.ndarray) -> "CompositeVideoClip":
+        """Fondo durante toda la narración, con cada subtítulo en su intervalo de la tabla de tiempos."""
+        from moviepy.editor import AudioFileClip, CompositeVideoClip, ImageClip
+
+        # Un único lector de audio para toda la narración, no uno por segmento.
+        audio_clip = AudioFileClip(narration_path)
         duration = audio_clip.duration
-        
-        bg_clip = ImageClip(bg_path, duration=duration).resize(self.resolution)
-        
-        text_size = (self.resolution[0] * 0.8, None) 
-        subtitle_clip = TextClip(
-            txt=dialogue.text,
-            fontsize=self.fontsize,
-            color=self.font_color,
-            font=self.font,
-            size=text_size,
-            method='caption'
-        ).set_position(('center', 'bottom')).set_duration(duration)
-
-        composite_clip = CompositeVideoClip([bg_clip, subtitle_clip])
+
+        clips = [ImageClip(bg_frame, duration=duration)]
+        text_width = int(self.resolution[0] * 0.8)
+        for index, start, end in timings:
+            subtitle_image = self.subtitle_renderer.render(story.script[index].text, self.fontsize, text_width)
+            clips.append(
+                ImageClip(subtitle_image, transparent=True)
+                .set_start(start)
+                .set_duration(min(end, duration) - start)
+                .set_position(('center', 'bottom'))
+            )
+
+        composite_clip = CompositeVideoClip(clips, size=self.resolution).set_duration(duration)
         composite_clip.audio = audio_clip
-        
         return composite_clip
 
     def _create_default_background(self, path: str):
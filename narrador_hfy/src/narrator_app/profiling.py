@@ -0,0 +1,394 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+class StartupProfiler:
+    """
+    Registra el coste de arranque de cada módulo del pipeline: el tiempo de
+    importación, el de construcción de la clase y el de carga de su modelo.
+
+    Los módulos se cargan de forma diferida, así que el informe solo incluye
+    los que la ejecución ha necesitado realmente.
+    """
+
+    def __init__(self):
+        self._entries: List[Dict] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, kind: str, module: str) -> Iterator[None]:
+        """Mide el bloque como `kind` ('import', 'init' o 'load') del módulo indicado."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._entries.append({
+                    "module": module,
+                    "kind": kind,
+                    "seconds": round(seconds, 4),
+                    "thread": threading.current_thread().name,
+                })
+            logger.info(f"Arranque de '{module}': {kind} en {seconds:.2f}s")
+
+    def report(self) -> List[Dict]:
+        with self._lock:
+            return list(self._entries)
+
+    def format_report(self) -> str:
+        """Tabla de texto con el tiempo de importación, construcción y carga por módulo."""
+        totals: Dict[str, Dict[str, float]] = {}
+        for entry in self.report():
+            row = totals.setdefault(entry["module"], {"import": 0.0, "init": 0.0, "load": 0.0})
+            row[entry["kind"]] = row.get(entry["kind"], 0.0) + entry["seconds"]
+
+        lines = [f"{'módulo':<18}{'import (s)':>12}{'init (s)':>10}{'carga (s)':>11}{'total (s)':>11}"]
+        for module, row in totals.items():
+            lines.append(f"{module:<18}{row['import']:>12.2f}{row['init']:>10.2f}{row['load']:>11.2f}{sum(row.values()):>11.2f}")
+        if not totals:
+            lines.append("(ningún módulo cargado)")
+        return "\n".join(lines)
+
+# Instancia compartida por todo el proceso.
+startup_profiler = StartupProfiler()
+
+
+def _cpu_seconds() -> float:
+    """CPU consumida por el proceso y por los subprocesos ya terminados (p. ej. ffmpeg)."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+# CPU de los subprocesos esperados desde cada hilo con run_subprocess().
+_thread_children = threading.local()
+
+def _thread_cpu_seconds() -> float:
+    """CPU del hilo actual más la de los subprocesos que ha esperado con run_subprocess()."""
+    return time.thread_time() + getattr(_thread_children, "cpu_s", 0.0)
+
+def run_subprocess(command: List[str], cwd: Optional[str] = None) -> subprocess.CompletedProcess:
+    """
+    Como subprocess.run(check=True, capture_output=True, text=True), pero suma
+    la CPU del subproceso a la del hilo que lo espera, para que los tramos
+    medidos en paralelo con otros hilos la incluyan.
+    """
+    if not hasattr(os, 'wait4'):  # Windows
+        return subprocess.run(command, cwd=cwd, check=True, capture_output=True, text=True)
+    with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, cwd=cwd, stdout=stdout_file, stderr=stderr_file)
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        process.returncode = os.waitstatus_to_exitcode(status)
+        _thread_children.cpu_s = getattr(_thread_children, "cpu_s", 0.0) + usage.ru_utime + usage.ru_stime
+        stdout_file.seek(0)
+        stderr_file.seek(0)
+        stdout = stdout_file.read().decode('utf-8', errors='replace')
+        stderr = stderr_file.read().decode('utf-8', errors='replace')
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+# Sesión de traza activa (p. ej. una sesión de la interfaz); los tramos la guardan al abrirse.
+_trace_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_session", default=None)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def _current_rss_mb() -> Optional[float]:
+    """Memoria residente actual del proceso, en MB (None si no se puede medir)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:  # Windows y macOS
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    return None
+
+class Span:
+    """
+    Un tramo medido: se abre con `Tracer.span()` y, al cerrarse, guarda su tiempo
+    de reloj, su tiempo de CPU y el pico de RSS mientras estuvo abierto (muestreado
+    por el Tracer cada `rss_interval_s`). `items` y `unit` permiten calcular el
+    rendimiento (p. ej. párrafos/s o segundos de audio por segundo).
+
+    La CPU es la de todo el proceso (`cpu_scope` 'process') salvo que otro hilo
+    haya tenido abierto a la vez un tramo de la misma categoría, como las
+    etapas del modo streaming o del modo por lotes. Entonces es la del propio
+    hilo más la de los subprocesos que ha esperado (`cpu_scope` 'thread'), para
+    no atribuir a cada tramo la CPU de los demás.
+    """
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.items: Optional[float] = None
+        self.unit: Optional[str] = None
+        self.tid: Optional[int] = None
+        # Lo marca el Tracer si otro hilo abre un tramo de la misma categoría mientras este sigue abierto.
+        self.overlapped = False
+        self.peak_rss_mb: Optional[float] = None
+        self.session = _trace_session.get()
+
+    def observe_rss(self, rss_mb: Optional[float]):
+        if rss_mb is not None and (self.peak_rss_mb is None or rss_mb > self.peak_rss_mb):
+            self.peak_rss_mb = rss_mb
+
+    def __enter__(self) -> "Span":
+        # La hora de inicio es absoluta para poder alinear eventos de varios procesos.
+        self._start_time = time.time()
+        self._start = time.perf_counter()
+        self._cpu_start = _cpu_seconds()
+        self._thread_cpu_start = _thread_cpu_seconds()
+        self.tid = threading.get_ident()
+        self.observe_rss(_current_rss_mb())
+        self.tracer._open_span(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._start
+        self.tracer._close_span(self)
+        self.observe_rss(_current_rss_mb())
+        if self.overlapped:
+            cpu, cpu_scope = _thread_cpu_seconds() - self._thread_cpu_start, "thread"
+        else:
+            cpu, cpu_scope = _cpu_seconds() - self._cpu_start, "process"
+        event = {
+            "name": self.name,
+            "cat": self.category,
+            "start": self._start_time,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "cpu_scope": cpu_scope,
+            "peak_rss_mb": round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+            "items": self.items,
+            "unit": self.unit,
+            "throughput": round(self.items / wall, 3) if self.items is not None and wall > 0 else None,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "thread": threading.current_thread().name,
+            "error": exc_type.__name__ if exc_type else None,
+            "session": self.session,
+            "args": self.args,
+        }
+        self.tracer.record(event)
+        return False
+
+class _NullSpan:
+    items = None
+    unit = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+class Tracer:
+    """
+    Registro de rendimiento de las etapas ('stage') y de sus operaciones internas
+    (segmentos de voz, lotes de traducción, exportación de video...).
+
+    Los eventos se pueden exportar como JSON o en el formato de eventos de
+    Chrome (chrome://tracing, Perfetto), donde cada hilo y cada proceso
+    trabajador aparecen en su propia fila.
+
+    La instancia es de todo el proceso. Para que varias ejecuciones simultáneas
+    (p. ej. dos sesiones de la interfaz) no mezclen sus mediciones, cada una
+    puede activar su sesión con `set_session()`: los tramos guardan la sesión
+    activa al abrirse, y la consulta, la exportación y reset() se limitan a la
+    sesión actual. Sin sesión activa abarcan todos los eventos.
+    """
+
+    def __init__(self, max_events: int = 100_000):
+        self.enabled = True
+        self.origin = time.time()
+        # Intervalo de muestreo de la memoria residente de los tramos abiertos.
+        self.rss_interval_s = 0.05
+        self._events: "deque[Dict]" = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._active: List[Span] = []
+        self._spans_open = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def span(self, name: str, category: str = "op", **args):
+        if not self.enabled:
+            return _NullSpan()
+        return Span(self, name, category, args)
+
+    def _open_span(self, span: Span):
+        with self._lock:
+            for other in self._active:
+                if other.category == span.category and other.tid != span.tid:
+                    other.overlapped = span.overlapped = True
+            self._active.append(span)
+            self._spans_open.set()
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+                self._sampler.start()
+
+    def _close_span(self, span: Span):
+        with self._lock:
+            self._active.remove(span)
+
+    def _sample_rss(self):
+        """Hilo de fondo: anota la RSS actual en los tramos abiertos; espera sin muestrear si no hay ninguno."""
+        while True:
+            self._spans_open.wait()
+            rss_mb = _current_rss_mb()
+            with self._lock:
+                for span in self._active:
+                    span.observe_rss(rss_mb)
+                if not self._active:
+                    self._spans_open.clear()
+            time.sleep(self.rss_interval_s)
+
+    @staticmethod
+    def set_session(session: Optional[str]):
+        """Activa la sesión de traza en el contexto actual (el hilo que llama)."""
+        _trace_session.set(session)
+
+    @staticmethod
+    def bind(fn: Callable) -> Callable:
+        """Envuelve `fn` para que se ejecute en la sesión actual, p. ej. en otro hilo."""
+        session = _trace_session.get()
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            token = _trace_session.set(session)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _trace_session.reset(token)
+        return run
+
+    def record(self, event: Dict):
+        with self._lock:
+            self._events.append(event)
+
+    def reset(self):
+        """Olvida los eventos de la sesión actual (todos si no hay sesión)."""
+        session = _trace_session.get()
+        with self._lock:
+            if session is None:
+                self._events.clear()
+            else:
+                kept = [event for event in self._events if event.get("session") != session]
+                self._events.clear()
+                self._events.extend(kept)
+            self.origin = time.time()
+
+    def events(self) -> List[Dict]:
+        """Eventos de la sesión actual (todos si no hay sesión)."""
+        session = _trace_session.get()
+        with self._lock:
+            if session is None:
+                return list(self._events)
+            return [event for event in self._events if event.get("session") == session]
+
+    def drain(self) -> List[Dict]:
+        """Devuelve y olvida los eventos (lo usan los procesos trabajadores para enviarlos)."""
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def merge(self, events: List[Dict]):
+        """Añade eventos medidos en otro proceso, asignados a la sesión actual."""
+        session = _trace_session.get()
+        for event in events:
+            if event.get("session") is None:
+                event["session"] = session
+        with self._lock:
+            self._events.extend(events)
+
+    def stage_summary(self) -> List[Dict]:
+        """
+        Totales por etapa: tiempo de reloj, CPU, pico de RSS, elementos y
+        rendimiento. `cpu_scope` es 'thread' si alguna ejecución de la etapa se
+        solapó con otras (ver Span).
+        """
+        summary: Dict[str, Dict] = {}
+        for event in self.events():
+            if event["cat"] != "stage":
+                continue
+            row = summary.setdefault(event["name"], {
+                "stage": event["name"], "runs": 0, "wall_s": 0.0, "cpu_s": 0.0, "cpu_scope": "process",
+                "peak_rss_mb": None, "items": None, "unit": event["unit"],
+            })
+            row["runs"] += 1
+            if event.get("cpu_scope") == "thread":
+                row["cpu_scope"] = "thread"
+            row["wall_s"] += event["wall_s"]
+            row["cpu_s"] += event["cpu_s"]
+            if event["peak_rss_mb"] is not None:
+                row["peak_rss_mb"] = max(row["peak_rss_mb"] or 0.0, event["peak_rss_mb"])
+            if event["items"] is not None:
+                row["items"] = (row["items"] or 0) + event["items"]
+        for row in summary.values():
+            row["wall_s"] = round(row["wall_s"], 3)
+            row["cpu_s"] = round(row["cpu_s"], 3)
+            if row["items"] is not None:
+                row["items"] = round(row["items"], 3)
+            row["throughput"] = round(row["items"] / row["wall_s"], 3) if row["items"] and row["wall_s"] else None
+        return list(summary.values())
+
+    def export_json(self, path: str):
+        self._write(path, {"summary": self.stage_summary(), "events": self.events()})
+
+    def export_chrome_trace(self, path: str):
+        trace_events = []
+        threads = {}
+        for event in self.events():
+            threads[(event["pid"], event["tid"])] = event["thread"]
+            args = {key: event.get(key) for key in ("cpu_s", "cpu_scope", "peak_rss_mb", "items", "unit",
+                                                    "throughput", "error")
+                    if event.get(key) is not None}
+            args.update(event["args"])
+            trace_events.append({
+                "name": event["name"],
+                "cat": event["cat"],
+                "ph": "X",
+                "ts": int((event["start"] - self.origin) * 1_000_000),
+                "dur": int(event["wall_s"] * 1_000_000),
+                "pid": event["pid"],
+                "tid": event["tid"],
+                "args": args,
+            })
+        for (pid, tid), name in threads.items():
+            trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        self._write(path, {"traceEvents": trace_events, "displayTimeUnit": "ms"})
+
+    @staticmethod
+    def _write(path: str, data: Dict):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+# Instancia compartida por todo el proceso.
+tracer = Tracer()
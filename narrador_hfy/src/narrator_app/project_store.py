@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Tuple
+
+from .data_structures import Story
+from .utils import AppError
+
+logger = logging.getLogger(__name__)
+
+# Etapas del pipeline en orden; cada proyecto recuerda cuáles ha completado.
+STAGES = ["fetched", "translated", "analyzed", "synthesized", "rendered"]
+
+class ProjectStore:
+    """
+    Persiste cada ejecución como un directorio de proyecto bajo `paths.projects`.
+
+    Cada proyecto contiene el modelo `Story` serializado tras cada etapa
+    (story.json), un manifiesto con las etapas completadas (manifest.json) y
+    el audio de los segmentos (audio/), de modo que una ejecución interrumpida
+    puede reanudarse sin repetir el trabajo ya hecho.
+    """
+
+    def __init__(self, config: Dict):
+        self.projects_dir = config.get('paths', {}).get('projects', 'data/projects/')
+
+    @staticmethod
+    def project_id_for_url(url: str) -> str:
+        """Identificador estable para una URL: el id del post de Reddit y su título."""
+        match = re.search(r'/comments/([a-z0-9]+)(?:/([^/?#]+))?', url)
+        if match:
+            return "_".join(part for part in match.groups() if part)
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+
+    def project_dir(self, project_id: str) -> str:
+        return os.path.join(self.projects_dir, project_id)
+
+    def audio_dir(self, project_id: str) -> str:
+        return os.path.join(self.project_dir(project_id), "audio")
+
+    def exists(self, project_id: str) -> bool:
+        return os.path.exists(os.path.join(self.project_dir(project_id), "manifest.json"))
+
+    def list_projects(self) -> List[Dict]:
+        """Devuelve los manifiestos de todos los proyectos, del más reciente al más antiguo."""
+        if not os.path.isdir(self.projects_dir):
+            return []
+        manifests = []
+        for project_id in os.listdir(self.projects_dir):
+            if self.exists(project_id):
+                manifests.append(self.load_manifest(project_id))
+        return sorted(manifests, key=lambda m: m.get('updated_at', 0), reverse=True)
+
+    def load_manifest(self, project_id: str) -> Dict:
+        with open(os.path.join(self.project_dir(project_id), "manifest.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self, project_id: str) -> Tuple[Story, Dict]:
+        if not self.exists(project_id):
+            raise AppError(f"No existe el proyecto: {project_id}")
+        manifest = self.load_manifest(project_id)
+        with open(os.path.join(self.project_dir(project_id), "story.json"), 'r', encoding='utf-8') as f:
+            story = Story.model_validate_json(f.read())
+        logger.info(f"Proyecto '{project_id}' cargado (etapas completadas: {manifest.get('stages', [])}).")
+        return story, manifest
+
+    def save(self, project_id: str, story: Story, *stages: str, **extra) -> Dict:
+        """
+        Guarda el estado actual de la historia y marca como completadas las etapas
+        indicadas. Los datos adicionales (p. ej. output_path) van al manifiesto.
+        """
+        directory = self.project_dir(project_id)
+        os.makedirs(directory, exist_ok=True)
+        manifest = self.load_manifest(project_id) if self.exists(project_id) else {
+            "project_id": project_id,
+            "url": story.url,
+            "title": story.title,
+            "stages": [],
+            "created_at": time.time(),
+        }
+        for stage in stages:
+            if stage not in manifest["stages"]:
+                manifest["stages"].append(stage)
+        manifest["title"] = story.title
+        manifest["updated_at"] = time.time()
+        manifest.update(extra)
+
+        self._write_atomic(os.path.join(directory, "story.json"), story.model_dump_json(indent=2))
+        self._write_atomic(os.path.join(directory, "manifest.json"), json.dumps(manifest, indent=2, ensure_ascii=False))
+        return manifest
+
+    def invalidate_from(self, project_id: str, stage: str):
+        """Olvida `stage` y todas las etapas posteriores (p. ej. al volver a descargar la historia)."""
+        if not self.exists(project_id):
+            return
+        manifest = self.load_manifest(project_id)
+        later = set(STAGES[STAGES.index(stage):])
+        manifest["stages"] = [s for s in manifest["stages"] if s not in later]
+        manifest["updated_at"] = time.time()
+        self._write_atomic(os.path.join(self.project_dir(project_id), "manifest.json"),
+                           json.dumps(manifest, indent=2, ensure_ascii=False))
+
+    @staticmethod
+    def _write_atomic(path: str, content: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)